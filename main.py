@@ -1,27 +1,479 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
 import schedule
 import time
 import threading
 import requests
+import asyncio
+import aiohttp
+import atexit
+from concurrent.futures import CancelledError
 import logging
-from datetime import datetime
+import logging.handlers
+import queue
+import re
+import copy
+import random
+import contextvars
+from datetime import datetime, timedelta, timezone, date
+from zoneinfo import ZoneInfo
+from contextlib import closing, contextmanager
+import sqlite3
 from urllib.parse import urlparse
 import jwt
 from pathlib import Path
 import io
+import gzip
+import csv
+import math
+import hashlib
+import xml.etree.ElementTree as ET
 import os
+import sys
+import argparse
+import uuid
+import cProfile
+import pstats
+from dataclasses import dataclass, field, fields
+from collections import OrderedDict
+from matplotlib.figure import Figure
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('gurufocus_bot.log'),
-        logging.StreamHandler()
-    ]
-)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+LOG_FILE = 'gurufocus_bot.log'
+
+# Identifiant de l'exécution en cours, ajouté à chaque enregistrement de log
+current_run_id = contextvars.ContextVar('current_run_id', default=None)
+
+
+class RunContextFilter(logging.Filter):
+    """Ajoute l'identifiant d'exécution courant aux enregistrements"""
+
+    def filter(self, record):
+        if getattr(record, 'run_id', None) is None:
+            record.run_id = current_run_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Échantillonne les lignes marquées sample=True (logs volumineux par ticker)"""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if not getattr(record, 'sample', False) or record.levelno >= logging.WARNING:
+            return True
+        return self.rate >= 1.0 or random.random() < self.rate
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Formate les enregistrements en une ligne JSON"""
+
+    CONTEXT_FIELDS = ('run_id', 'ticker', 'latency_ms')
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        for name in self.CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """Met en file les enregistrements en gardant le message et la trace d'exception séparés"""
+
+    def prepare(self, record):
+        # Comme QueueHandler.prepare (message résolu, objets non sérialisables retirés),
+        # sans fusionner la trace dans le message: elle passe par exc_text
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def setup_logging(level: str = "INFO", sample_rate: float = 1.0):
+    """Installe le pipeline de logs asynchrone: file d'attente + thread d'écriture dédié"""
+    root = logging.getLogger()
+    # Les reruns Streamlit rappellent le point d'entrée: ne configurer qu'une fois par processus
+    for handler in root.handlers:
+        if isinstance(handler, logging.handlers.QueueHandler):
+            for log_filter in handler.filters:
+                if isinstance(log_filter, SamplingFilter):
+                    log_filter.rate = sample_rate
+            root.setLevel(level)
+            return
+
+    file_handler = logging.FileHandler(LOG_FILE, encoding='utf-8')
+    file_handler.setFormatter(JsonLogFormatter())
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LogQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+    queue_handler.addFilter(RunContextFilter())
+
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+
+@contextmanager
+def run_context(run_id: str):
+    """Associe un identifiant d'exécution aux logs émis dans le bloc"""
+    token = current_run_id.set(run_id)
+    try:
+        yield run_id
+    finally:
+        current_run_id.reset(token)
+
+
+class ConfigValidationError(ValueError):
+    """Erreur de validation du fichier de configuration"""
+
+
+# Anciennes clés acceptées pour les entrées du portfolio
+PORTFOLIO_KEY_ALIASES = {
+    "in_portofolio": "in_portfolio",
+    "symbol": "ticker",
+    "qty": "quantity",
+}
+
+
+REPORT_FORMATS = ('html', 'csv', 'png')
+
+
+@dataclass(slots=True)
+class TelegramSettings:
+    bot_token: str = ""
+    # Un ou plusieurs chats, séparés par des virgules
+    chat_id: str = ""
+    report_formats: list = field(default_factory=lambda: ['html'])
+
+    @property
+    def chat_ids(self) -> list:
+        return [chat.strip() for chat in self.chat_id.split(',') if chat.strip()]
+
+    @property
+    def is_configured(self) -> bool:
+        return bool(self.bot_token and self.chat_ids)
+
+
+@dataclass(slots=True)
+class ScheduleSettings:
+    execution_times: list = field(default_factory=lambda: ["07:25", "19:35"])
+    holidays: dict = field(default_factory=dict)
+    # Ne pas envoyer le rapport planifié lorsqu'aucun ticker n'a été rafraîchi
+    skip_unchanged: bool = False
+
+
+@dataclass(slots=True)
+class FxSettings:
+    base_currency: str = "EUR"
+
+
+@dataclass(slots=True)
+class ScreenerSettings:
+    enabled: bool = False
+    universe_file: str = ""
+    max_valuation: float = -20.0
+    gf_valuations: list = field(default_factory=list)
+    top_n: int = 10
+    slice_interval_minutes: int = 30
+    max_age_days: int = 3
+
+
+@dataclass(slots=True)
+class ScenarioSettings:
+    # Décotes appliquées à la croissance, décalages de la GF Value et chocs de prix (fractions)
+    growth_haircuts: list = field(default_factory=lambda: [0.0, 0.25, 0.5])
+    gf_shifts: list = field(default_factory=lambda: [-0.2, -0.1, 0.0, 0.1])
+    price_shocks: list = field(default_factory=lambda: [-0.2, 0.0, 0.1])
+    horizon_years: float = 1.0
+    send_telegram: bool = False
+
+
+@dataclass(slots=True)
+class LoggingSettings:
+    level: str = "INFO"
+    # Proportion conservée des lignes INFO par ticker (1.0 = toutes)
+    sample_rate: float = 1.0
+
+
+@dataclass(slots=True)
+class DebugSettings:
+    profile: bool = False
+    profile_top_n: int = 25
+
+
+@dataclass(slots=True)
+class PortfolioEntry:
+    ticker: str
+    in_portfolio: bool = False
+    quantity: float = None
+
+
+@dataclass(slots=True)
+class AppConfig:
+    """Configuration validée et compilée (index ticker -> entrée du portfolio)"""
+
+    telegram: TelegramSettings = field(default_factory=TelegramSettings)
+    schedule: ScheduleSettings = field(default_factory=ScheduleSettings)
+    fx: FxSettings = field(default_factory=FxSettings)
+    screener: ScreenerSettings = field(default_factory=ScreenerSettings)
+    scenarios: ScenarioSettings = field(default_factory=ScenarioSettings)
+    logging: LoggingSettings = field(default_factory=LoggingSettings)
+    debug: DebugSettings = field(default_factory=DebugSettings)
+    portfolio: list = field(default_factory=list)
+    # Sections non typées conservées telles quelles (ex: scheduler_status)
+    extras: dict = field(default_factory=dict)
+    index: dict = field(default_factory=dict)
+    held_count: int = 0
+
+    @classmethod
+    def from_dict(cls, raw) -> "AppConfig":
+        """Valide une configuration brute et la compile"""
+        if not isinstance(raw, dict):
+            raise ConfigValidationError("La configuration doit être un objet JSON")
+
+        errors = []
+        known_sections = {'telegram', 'schedule', 'fx', 'screener', 'scenarios', 'logging', 'debug', 'portfolio'}
+
+        telegram_raw = cls._section(raw, 'telegram', errors)
+        chat_id = telegram_raw.get('chat_id') or ''
+        if isinstance(chat_id, list):
+            chat_id = ','.join(str(chat) for chat in chat_id)
+        report_formats = telegram_raw.get('report_formats', ['html'])
+        if not isinstance(report_formats, list) or not report_formats:
+            errors.append("telegram.report_formats doit être une liste non vide")
+            report_formats = ['html']
+        for fmt in report_formats:
+            if fmt not in REPORT_FORMATS:
+                errors.append(f"telegram.report_formats: format inconnu {fmt!r} (attendus: {', '.join(REPORT_FORMATS)})")
+        telegram = TelegramSettings(
+            bot_token=str(telegram_raw.get('bot_token') or ''),
+            chat_id=str(chat_id),
+            report_formats=list(dict.fromkeys(report_formats)))
+
+        schedule_raw = cls._section(raw, 'schedule', errors)
+        execution_times = schedule_raw.get('execution_times', ["07:25", "19:35"])
+        if not isinstance(execution_times, list):
+            errors.append("schedule.execution_times doit être une liste")
+            execution_times = []
+        for time_str in execution_times:
+            # Format strict attendu par schedule (ex: "07:25", pas "7:25")
+            match = re.fullmatch(r'(\d{2}):(\d{2})', time_str) if isinstance(time_str, str) else None
+            if not match or int(match.group(1)) > 23 or int(match.group(2)) > 59:
+                errors.append(f"schedule.execution_times: heure invalide {time_str!r} (format HH:MM attendu, ex: 07:25)")
+        holidays_raw = schedule_raw.get('holidays', {})
+        if not isinstance(holidays_raw, dict):
+            errors.append("schedule.holidays doit être un objet {place: [dates]}")
+            holidays_raw = {}
+        # Normalisation: places en majuscules, une date seule devient une liste
+        holidays = {}
+        for exchange, days in holidays_raw.items():
+            exchange = str(exchange).strip().upper()
+            for day in days if isinstance(days, list) else [days]:
+                try:
+                    date.fromisoformat(day)
+                except (TypeError, ValueError):
+                    errors.append(f"schedule.holidays.{exchange}: date invalide {day!r} (format AAAA-MM-JJ attendu)")
+                    continue
+                if day not in holidays.setdefault(exchange, []):
+                    holidays[exchange].append(day)
+
+        fx_raw = cls._section(raw, 'fx', errors)
+        fx = FxSettings(base_currency=str(fx_raw.get('base_currency', 'EUR')).upper())
+
+        screener_raw = cls._section(raw, 'screener', errors)
+        screener = ScreenerSettings()
+        try:
+            screener = ScreenerSettings(
+                enabled=bool(screener_raw.get('enabled', False)),
+                universe_file=str(screener_raw.get('universe_file', '')),
+                max_valuation=float(screener_raw.get('max_valuation', -20.0)),
+                gf_valuations=list(screener_raw.get('gf_valuations', [])),
+                top_n=int(screener_raw.get('top_n', 10)),
+                slice_interval_minutes=int(screener_raw.get('slice_interval_minutes', 30)),
+                max_age_days=int(screener_raw.get('max_age_days', 3)))
+        except (TypeError, ValueError) as e:
+            errors.append(f"screener: valeur invalide ({e})")
+        if screener.enabled and not screener.universe_file:
+            errors.append("screener.universe_file est requis lorsque le screener est activé")
+        if screener.slice_interval_minutes <= 0 or screener.top_n <= 0:
+            errors.append("screener.slice_interval_minutes et screener.top_n doivent être positifs")
+
+        scenarios_raw = cls._section(raw, 'scenarios', errors)
+        scenarios = ScenarioSettings()
+        try:
+            scenarios = ScenarioSettings(
+                growth_haircuts=[float(v) for v in scenarios_raw.get('growth_haircuts', scenarios.growth_haircuts)],
+                gf_shifts=[float(v) for v in scenarios_raw.get('gf_shifts', scenarios.gf_shifts)],
+                price_shocks=[float(v) for v in scenarios_raw.get('price_shocks', scenarios.price_shocks)],
+                horizon_years=float(scenarios_raw.get('horizon_years', 1.0)),
+                send_telegram=bool(scenarios_raw.get('send_telegram', False)))
+        except (TypeError, ValueError) as e:
+            errors.append(f"scenarios: valeur invalide ({e})")
+        if not (scenarios.growth_haircuts and scenarios.gf_shifts and scenarios.price_shocks):
+            errors.append("scenarios: chaque liste de paramètres doit contenir au moins une valeur")
+
+        logging_raw = cls._section(raw, 'logging', errors)
+        logging_settings = LoggingSettings()
+        try:
+            logging_settings = LoggingSettings(
+                level=str(logging_raw.get('level', 'INFO')).upper(),
+                sample_rate=float(logging_raw.get('sample_rate', 1.0)))
+        except (TypeError, ValueError) as e:
+            errors.append(f"logging: valeur invalide ({e})")
+        if logging_settings.level not in ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'):
+            errors.append(f"logging.level invalide: {logging_settings.level}")
+        if not 0.0 <= logging_settings.sample_rate <= 1.0:
+            errors.append("logging.sample_rate doit être compris entre 0 et 1")
+
+        debug_raw = cls._section(raw, 'debug', errors)
+        debug = DebugSettings()
+        try:
+            debug = DebugSettings(profile=bool(debug_raw.get('profile', False)),
+                                  profile_top_n=int(debug_raw.get('profile_top_n', 25)))
+        except (TypeError, ValueError) as e:
+            errors.append(f"debug: valeur invalide ({e})")
+
+        portfolio_raw = raw.get('portfolio', [])
+        if not isinstance(portfolio_raw, list):
+            errors.append("portfolio doit être une liste")
+            portfolio_raw = []
+
+        portfolio = []
+        index = {}
+        for position, item in enumerate(portfolio_raw):
+            entry = cls._portfolio_entry(item, position, errors)
+            if entry is None:
+                continue
+            if entry.ticker in index:
+                logging.warning(f"Ticker en double ignoré dans le portfolio: {entry.ticker}")
+                continue
+            index[entry.ticker] = entry
+            portfolio.append(entry)
+
+        if errors:
+            raise ConfigValidationError(
+                "Configuration invalide:\n- " + "\n- ".join(errors))
+
+        return cls(
+            telegram=telegram,
+            schedule=ScheduleSettings(execution_times=execution_times, holidays=holidays,
+                                      skip_unchanged=bool(schedule_raw.get('skip_unchanged', False))),
+            fx=fx,
+            screener=screener,
+            scenarios=scenarios,
+            logging=logging_settings,
+            debug=debug,
+            portfolio=portfolio,
+            extras={k: v for k, v in raw.items() if k not in known_sections},
+            index=index,
+            held_count=sum(1 for entry in portfolio if entry.in_portfolio))
+
+    @staticmethod
+    def _section(raw: dict, name: str, errors: list) -> dict:
+        section = raw.get(name) or {}
+        if not isinstance(section, dict):
+            errors.append(f"{name} doit être un objet")
+            return {}
+        return section
+
+    @staticmethod
+    def _portfolio_entry(item, position: int, errors: list):
+        """Normalise une entrée du portfolio (alias de clés, casse du ticker)"""
+        if isinstance(item, str):
+            item = {'ticker': item}
+        if not isinstance(item, dict):
+            errors.append(f"portfolio[{position}]: entrée invalide {item!r}")
+            return None
+
+        normalized = {PORTFOLIO_KEY_ALIASES.get(key, key): value for key, value in item.items()}
+        ticker = str(normalized.get('ticker') or '').strip().upper()
+        if not ticker:
+            errors.append(f"portfolio[{position}]: ticker manquant")
+            return None
+
+        in_portfolio = normalized.get('in_portfolio', False)
+        if not isinstance(in_portfolio, bool):
+            errors.append(f"portfolio[{position}] ({ticker}): in_portfolio doit être true ou false")
+            return None
+
+        quantity = normalized.get('quantity')
+        if quantity is not None:
+            try:
+                quantity = float(quantity)
+            except (TypeError, ValueError):
+                errors.append(f"portfolio[{position}] ({ticker}): quantité invalide {quantity!r}")
+                return None
+
+        return PortfolioEntry(ticker=ticker, in_portfolio=in_portfolio, quantity=quantity)
+
+    def to_dict(self) -> dict:
+        """Sérialise la configuration normalisée"""
+        portfolio = []
+        for entry in self.portfolio:
+            item = {'ticker': entry.ticker, 'in_portfolio': entry.in_portfolio}
+            if entry.quantity is not None:
+                item['quantity'] = entry.quantity
+            portfolio.append(item)
+
+        return {
+            'telegram': {'bot_token': self.telegram.bot_token, 'chat_id': self.telegram.chat_id,
+                         'report_formats': self.telegram.report_formats},
+            'schedule': {'execution_times': self.schedule.execution_times,
+                         'holidays': self.schedule.holidays,
+                         'skip_unchanged': self.schedule.skip_unchanged},
+            'fx': {'base_currency': self.fx.base_currency},
+            'screener': {
+                'enabled': self.screener.enabled,
+                'universe_file': self.screener.universe_file,
+                'max_valuation': self.screener.max_valuation,
+                'gf_valuations': self.screener.gf_valuations,
+                'top_n': self.screener.top_n,
+                'slice_interval_minutes': self.screener.slice_interval_minutes,
+                'max_age_days': self.screener.max_age_days
+            },
+            'scenarios': {
+                'growth_haircuts': self.scenarios.growth_haircuts,
+                'gf_shifts': self.scenarios.gf_shifts,
+                'price_shocks': self.scenarios.price_shocks,
+                'horizon_years': self.scenarios.horizon_years,
+                'send_telegram': self.scenarios.send_telegram
+            },
+            'logging': {'level': self.logging.level, 'sample_rate': self.logging.sample_rate},
+            'debug': {'profile': self.debug.profile, 'profile_top_n': self.debug.profile_top_n},
+            'portfolio': portfolio,
+            **self.extras
+        }
+
+    @property
+    def tickers(self) -> list:
+        return list(self.index)
 
 
 class ConfigManager:
@@ -44,6 +496,8 @@ class ConfigManager:
                 "execution_in_progress": False
             }
         }
+        self.validation_error = None
+        self._compiled = None
 
     def get_config(self):
         """Récupère la configuration depuis le fichier ou retourne la config par défaut"""
@@ -96,10 +550,27 @@ class ConfigManager:
         config = self.get_config()
         return config.get('scheduler_status', {}).get('running', False)
 
+    def get_app_config(self) -> AppConfig:
+        """Retourne la configuration validée, compilée une seule fois par version du fichier"""
+        mtime = self.config_file.stat().st_mtime_ns if self.config_file.exists() else None
+        if self._compiled is not None and self._compiled[0] == mtime:
+            return self._compiled[1]
+
+        try:
+            app_config = AppConfig.from_dict(self.get_config())
+            self.validation_error = None
+        except ConfigValidationError as e:
+            logging.error(f"Configuration enregistrée invalide: {e}")
+            self.validation_error = str(e)
+            app_config = AppConfig.from_dict(self.default_config)
+
+        self._compiled = (mtime, app_config)
+        return app_config
+
     def load_from_file(self, file_content):
         """Charge la configuration depuis un fichier JSON et la sauvegarde"""
         try:
-            config_data = json.loads(file_content)
+            config_data = AppConfig.from_dict(json.loads(file_content)).to_dict()
             # Préserver le statut du planificateur existant
             current_config = self.get_config()
             if 'scheduler_status' in current_config:
@@ -112,14 +583,794 @@ class ConfigManager:
                 return True, "Configuration chargée et sauvegardée avec succès!"
             else:
                 return False, "Erreur lors de la sauvegarde de la configuration"
+        except ConfigValidationError as e:
+            return False, str(e)
         except Exception as e:
             return False, f"Erreur lors du chargement: {e}"
 
 
+@dataclass(slots=True)
+class StockResult:
+    """Résultat de l'analyse d'un ticker"""
+
+    ticker: str
+    success: bool = False
+    current_price: float = None
+    gf_value: float = None
+    valuation: float = None
+    currency: str = None
+    exchange: str = None
+    gf_valuation: str = None
+    earning_growth_5y: float = None
+    rvnGrowth5y: float = None
+    in_portfolio: bool = False
+    quantity: float = None
+    from_snapshot: bool = False
+    error: str = None
+
+
+RESULT_FIELDS = tuple(f.name for f in fields(StockResult))
+
+
+class ResultBatch:
+    """Lot de résultats stocké par colonnes (tableaux NumPy), lu tel quel par l'interface,
+    les statistiques, Telegram et le stockage"""
+
+    FLOAT_COLUMNS = frozenset({'current_price', 'gf_value', 'valuation',
+                               'earning_growth_5y', 'rvnGrowth5y', 'quantity'})
+    BOOL_COLUMNS = frozenset({'success', 'in_portfolio', 'from_snapshot'})
+
+    __slots__ = ('columns',)
+
+    def __init__(self, columns: dict):
+        self.columns = columns
+
+    @classmethod
+    def from_records(cls, records) -> "ResultBatch":
+        """Construit un lot à partir de StockResult (None -> NaN pour les colonnes numériques)"""
+        records = list(records)
+        return cls.from_columns({name: [getattr(record, name) for record in records]
+                                 for name in RESULT_FIELDS})
+
+    @classmethod
+    def from_columns(cls, values: dict, **defaults) -> "ResultBatch":
+        """Construit un lot à partir de séquences par colonne; les colonnes absentes
+        prennent la valeur par défaut fournie (sinon celle de StockResult)"""
+        size = len(values['ticker'])
+        columns = {}
+        for result_field in fields(StockResult):
+            name = result_field.name
+            column = values.get(name)
+            if column is None:
+                column = [defaults.get(name, result_field.default)] * size
+            if name in cls.FLOAT_COLUMNS:
+                columns[name] = np.array(column, dtype=np.float64)
+            elif name in cls.BOOL_COLUMNS:
+                columns[name] = np.array(column, dtype=bool)
+            else:
+                columns[name] = np.array(column, dtype=object)
+        return cls(columns)
+
+    @classmethod
+    def empty(cls) -> "ResultBatch":
+        return cls.from_columns({'ticker': []})
+
+    @classmethod
+    def concat(cls, batches) -> "ResultBatch":
+        """Concatène plusieurs lots"""
+        batches = list(batches)
+        return cls({name: np.concatenate([batch.columns[name] for batch in batches])
+                    for name in RESULT_FIELDS})
+
+    def __len__(self):
+        return len(self.columns['ticker'])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def values(self, name: str) -> list:
+        """Valeurs Python d'une colonne (NaN -> None), prêtes pour SQLite"""
+        column = self.columns[name]
+        if name in self.FLOAT_COLUMNS:
+            column = column.astype(object)
+            column[np.isnan(self.columns[name])] = None
+        return column.tolist()
+
+    def __iter__(self):
+        """Parcourt les lignes sous forme de StockResult (NaN -> None)"""
+        for row in zip(*(self.values(name) for name in RESULT_FIELDS)):
+            yield StockResult(*row)
+
+    def select(self, mask: np.ndarray) -> "ResultBatch":
+        """Retourne le sous-lot des lignes sélectionnées (masque ou indices)"""
+        return ResultBatch({name: column[mask] for name, column in self.columns.items()})
+
+    @property
+    def successful(self) -> "ResultBatch":
+        return self.select(self.columns['success'])
+
+    def to_frame(self) -> pd.DataFrame:
+        """Vue DataFrame des colonnes, sans copie des tableaux"""
+        return pd.DataFrame(self.columns, copy=False)
+
+    @property
+    def snapshot_id(self) -> str:
+        """Empreinte du contenu du lot (identique pour deux lots aux mêmes données)"""
+        digest = hashlib.sha256()
+        for name in RESULT_FIELDS:
+            if name == 'from_snapshot':
+                continue
+            column = self.columns[name]
+            digest.update(name.encode('utf-8'))
+            if column.dtype == object:
+                digest.update(json.dumps(column.tolist(), default=str).encode('utf-8'))
+            else:
+                digest.update(column.tobytes())
+        return digest.hexdigest()[:16]
+
+
+# Métadonnées des places de cotation, indexées par préfixe de ticker GuruFocus
+# (les tickers sans préfixe sont considérés comme cotés aux États-Unis)
+EXCHANGE_METADATA = {
+    "US": {"mic": None, "currency": "USD", "timezone": "America/New_York", "open": "09:30", "close": "16:00"},
+    "XPAR": {"mic": "XPAR", "currency": "EUR", "timezone": "Europe/Paris", "open": "09:00", "close": "17:30"},
+    "XAMS": {"mic": "XAMS", "currency": "EUR", "timezone": "Europe/Amsterdam", "open": "09:00", "close": "17:30"},
+    "XBRU": {"mic": "XBRU", "currency": "EUR", "timezone": "Europe/Brussels", "open": "09:00", "close": "17:30"},
+    "XTER": {"mic": "XETR", "currency": "EUR", "timezone": "Europe/Berlin", "open": "09:00", "close": "17:30"},
+    "XMIL": {"mic": "XMIL", "currency": "EUR", "timezone": "Europe/Rome", "open": "09:00", "close": "17:30"},
+    "XMAD": {"mic": "XMAD", "currency": "EUR", "timezone": "Europe/Madrid", "open": "09:00", "close": "17:30"},
+    "XSWX": {"mic": "XSWX", "currency": "CHF", "timezone": "Europe/Zurich", "open": "09:00", "close": "17:30"},
+    "OSTO": {"mic": "XSTO", "currency": "SEK", "timezone": "Europe/Stockholm", "open": "09:00", "close": "17:30"},
+    "LSE": {"mic": "XLON", "currency": "GBP", "timezone": "Europe/London", "open": "08:00", "close": "16:30"},
+    "TSX": {"mic": "XTSE", "currency": "CAD", "timezone": "America/Toronto", "open": "09:30", "close": "16:00"},
+    "HKSE": {"mic": "XHKG", "currency": "HKD", "timezone": "Asia/Hong_Kong", "open": "09:30", "close": "16:00"},
+    "TSE": {"mic": "XTKS", "currency": "JPY", "timezone": "Asia/Tokyo", "open": "09:00", "close": "15:30"},
+}
+
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "CHF": "CHF ", "JPY": "¥",
+                    "CAD": "C$", "HKD": "HK$", "SEK": "kr "}
+
+
+def format_price(value, currency) -> str:
+    """Formate un prix avec le symbole de sa devise"""
+    if value is None or math.isnan(value):
+        return "N/A"
+    symbol = CURRENCY_SYMBOLS.get(currency, f"{currency} " if currency else "")
+    return f"{symbol}{value:.2f}"
+
+
+def format_column(values: np.ndarray, spec: str, suffix: str = "") -> list:
+    """Formate une colonne numérique d'un lot (NaN ou 0 -> "N/A")"""
+    return [f"{value:{spec}}{suffix}" if value == value and value else "N/A" for value in values.tolist()]
+
+
+class SymbolMetadataCache:
+    """Index persistant des métadonnées de symboles (place, MIC, devise, horaires)"""
+
+    def __init__(self, cache_file="gurufocus_symbols.json", ttl_days=30):
+        self.cache_file = Path(cache_file)
+        self.ttl = timedelta(days=ttl_days)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries = self._load()
+
+    def _load(self):
+        """Charge l'index depuis le disque"""
+        if not self.cache_file.exists():
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.error(f"Erreur lors de la lecture du cache des symboles: {e}")
+            return {}
+
+    def save(self):
+        """Sauvegarde l'index sur disque s'il a été modifié"""
+        with self._lock:
+            if not self._dirty:
+                return True
+            try:
+                with open(self.cache_file, 'w', encoding='utf-8') as f:
+                    json.dump(self._entries, f, indent=2, ensure_ascii=False)
+                self._dirty = False
+                return True
+            except Exception as e:
+                logging.error(f"Erreur lors de la sauvegarde du cache des symboles: {e}")
+                return False
+
+    @staticmethod
+    def _resolve(ticker: str) -> dict:
+        """Résout les métadonnées d'un ticker à partir de son préfixe de place"""
+        exchange, _, symbol = ticker.rpartition(':')
+        exchange = exchange.upper() or "US"
+        metadata = EXCHANGE_METADATA.get(exchange)
+        if metadata is None:
+            logging.warning(f"Place de cotation inconnue pour {ticker}: {exchange}")
+            metadata = {"mic": exchange, "currency": None, "timezone": None, "open": None, "close": None}
+
+        return {
+            'ticker': ticker,
+            'symbol': symbol,
+            'exchange': exchange,
+            **metadata,
+            'resolved_at': datetime.now().isoformat(),
+            'last_seen': None
+        }
+
+    def get(self, ticker: str) -> dict:
+        """Retourne les métadonnées d'un ticker, résolues une seule fois puis mises en cache"""
+        entry = self._entries.get(ticker)
+        if entry is not None:
+            resolved_at = datetime.fromisoformat(entry['resolved_at'])
+            if datetime.now() - resolved_at < self.ttl:
+                return entry
+
+        with self._lock:
+            resolved = self._resolve(ticker)
+            if entry is not None:
+                # Conserver les informations observées dans les réponses de l'API
+                resolved['last_seen'] = entry.get('last_seen')
+                resolved['currency'] = entry.get('currency') or resolved['currency']
+            self._entries[ticker] = resolved
+            self._dirty = True
+        return resolved
+
+    def resolve_many(self, tickers) -> dict:
+        """Résout un lot de tickers"""
+        return {ticker: self.get(ticker) for ticker in tickers}
+
+    def observe(self, ticker: str, payload=None):
+        """Enregistre une récupération réussie et les informations fournies par l'API"""
+        entry = self.get(ticker)
+        with self._lock:
+            entry['last_seen'] = datetime.now().isoformat()
+            if payload and payload.get('currency'):
+                entry['currency'] = payload['currency']
+            self._dirty = True
+
+    def currency(self, ticker: str):
+        """Retourne la devise de cotation d'un ticker"""
+        return self.get(ticker).get('currency')
+
+    def mic_symbol(self, ticker: str) -> str:
+        """Retourne le symbole au format MIC:SYMBOLE attendu par l'API gf_rank"""
+        entry = self.get(ticker)
+        return f"{entry['mic']}:{entry['symbol']}" if entry.get('mic') else entry['symbol']
+
+
+# Règles de jours fériés par calendrier de place: dates fixes (mois, jour),
+# n-ième jour de semaine du mois (mois, jour de semaine, rang; -1 = dernier)
+# et décalages en jours par rapport au dimanche de Pâques
+MARKET_HOLIDAY_RULES = {
+    "US": {"fixed": [(1, 1), (6, 19), (7, 4), (12, 25)], "observed": True,
+           "nth_weekday": [(1, 0, 3), (2, 0, 3), (5, 0, -1), (9, 0, 1), (11, 3, 4)],
+           "easter": [-2]},
+    "EURONEXT": {"fixed": [(1, 1), (5, 1), (12, 25), (12, 26)], "easter": [-2, 1]},
+    "EUROPE": {"fixed": [(1, 1), (12, 25), (12, 26)], "easter": [-2, 1]},
+    "DEFAULT": {"fixed": [(1, 1), (12, 25)]},
+}
+
+EXCHANGE_CALENDARS = {
+    "US": "US", "XPAR": "EURONEXT", "XAMS": "EURONEXT", "XBRU": "EURONEXT",
+    "XTER": "EUROPE", "XMIL": "EUROPE", "XMAD": "EUROPE", "XSWX": "EUROPE",
+    "OSTO": "EUROPE", "LSE": "EUROPE",
+}
+
+
+def easter_sunday(year: int) -> date:
+    """Calcule la date du dimanche de Pâques (calendrier grégorien)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+class MarketCalendar:
+    """Calendrier des séances de bourse par place de cotation"""
+
+    def __init__(self, extra_holidays=None):
+        # Jours fériés supplémentaires issus de la configuration: {"XPAR": ["2026-12-24"]}
+        self.extra_holidays = {
+            exchange: {date.fromisoformat(day) for day in days}
+            for exchange, days in (extra_holidays or {}).items()
+        }
+        self._holidays_cache = {}
+
+    def holidays(self, exchange: str, year: int) -> set:
+        """Retourne l'ensemble des jours fériés d'une place pour une année"""
+        key = (exchange, year)
+        if key in self._holidays_cache:
+            return self._holidays_cache[key]
+
+        rules = MARKET_HOLIDAY_RULES[EXCHANGE_CALENDARS.get(exchange, "DEFAULT")]
+        days = set()
+
+        for month, day in rules.get('fixed', []):
+            holiday = date(year, month, day)
+            if rules.get('observed'):
+                # Report au vendredi ou au lundi lorsque le jour tombe un week-end
+                if holiday.weekday() == 5:
+                    holiday -= timedelta(days=1)
+                elif holiday.weekday() == 6:
+                    holiday += timedelta(days=1)
+            days.add(holiday)
+
+        for month, weekday, rank in rules.get('nth_weekday', []):
+            if rank > 0:
+                first = date(year, month, 1)
+                offset = (weekday - first.weekday()) % 7
+                days.add(first + timedelta(days=offset + 7 * (rank - 1)))
+            else:
+                last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+                days.add(last - timedelta(days=(last.weekday() - weekday) % 7))
+
+        easter = easter_sunday(year)
+        for offset in rules.get('easter', []):
+            days.add(easter + timedelta(days=offset))
+
+        days |= {d for d in self.extra_holidays.get(exchange, set()) if d.year == year}
+        self._holidays_cache[key] = days
+        return days
+
+    def is_trading_day(self, exchange: str, day: date) -> bool:
+        """Vérifie si une place est ouverte un jour donné"""
+        return day.weekday() < 5 and day not in self.holidays(exchange, day.year)
+
+    def last_trading_moment(self, metadata: dict, now=None):
+        """Retourne le dernier instant de cotation (maintenant si la séance est ouverte)"""
+        if not metadata.get('timezone') or not metadata.get('open') or not metadata.get('close'):
+            return None
+
+        tz = ZoneInfo(metadata['timezone'])
+        local_now = (now or datetime.now(timezone.utc)).astimezone(tz)
+        open_time = datetime.strptime(metadata['open'], '%H:%M').time()
+        close_time = datetime.strptime(metadata['close'], '%H:%M').time()
+
+        for days_back in range(15):
+            day = local_now.date() - timedelta(days=days_back)
+            if not self.is_trading_day(metadata['exchange'], day):
+                continue
+            session_open = datetime.combine(day, open_time, tzinfo=tz)
+            session_close = datetime.combine(day, close_time, tzinfo=tz)
+            if local_now >= session_close:
+                return session_close
+            if local_now >= session_open:
+                return local_now
+        return None
+
+    def needs_refresh(self, metadata: dict, last_fetch, now=None) -> bool:
+        """Vérifie si le marché d'un ticker a coté depuis son dernier instantané"""
+        if last_fetch is None:
+            return True
+        moment = self.last_trading_moment(metadata, now)
+        if moment is None:
+            return True
+        return last_fetch < moment
+
+
+class SnapshotStore:
+    """Stockage local du dernier instantané réussi de chaque ticker"""
+
+    # Colonnes persistées (hors ticker); la position et la quantité viennent de la configuration
+    COLUMNS = ('current_price', 'gf_value', 'valuation', 'currency', 'exchange',
+               'gf_valuation', 'earning_growth_5y', 'rvnGrowth5y')
+
+    def __init__(self, db_file="gurufocus_data.db"):
+        self.db_file = Path(db_file)
+        with closing(self._connect()) as conn, conn:
+            self._create_snapshots_table(conn)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS screener_state (
+                    universe TEXT PRIMARY KEY,
+                    cursor INTEGER NOT NULL,
+                    sweep_started_at TEXT,
+                    updated_at TEXT NOT NULL
+                )""")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def _create_snapshots_table(self, conn):
+        """Crée la table typée des instantanés, en migrant l'ancien format JSON le cas échéant"""
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(snapshots)")]
+        if columns and 'data' not in columns:
+            return
+        if columns:
+            conn.execute("ALTER TABLE snapshots RENAME TO snapshots_json")
+
+        definitions = ', '.join(
+            f"{name} {'REAL' if name in ResultBatch.FLOAT_COLUMNS else 'TEXT'}" for name in self.COLUMNS)
+        conn.execute(f"""
+            CREATE TABLE snapshots (
+                ticker TEXT PRIMARY KEY,
+                fetched_at TEXT NOT NULL,
+                {definitions}
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS snapshots_valuation ON snapshots (valuation)")
+
+        if columns:
+            extracted = ', '.join(f"json_extract(data, '$.{name}')" for name in self.COLUMNS)
+            conn.execute(f"""
+                INSERT INTO snapshots (ticker, fetched_at, {', '.join(self.COLUMNS)})
+                SELECT ticker, fetched_at, {extracted} FROM snapshots_json""")
+            conn.execute("DROP TABLE snapshots_json")
+            logging.info("Instantanés migrés vers le stockage par colonnes")
+
+    def _read_batch(self, conn, where: str, params, suffix: str = "") -> tuple:
+        """Lit des instantanés sous forme de lot: (ResultBatch, {ticker: fetched_at})"""
+        rows = conn.execute(
+            f"SELECT ticker, fetched_at, {', '.join(self.COLUMNS)} FROM snapshots WHERE {where} {suffix}",
+            params).fetchall()
+        if not rows:
+            return ResultBatch.empty(), {}
+        tickers, fetched_at, *values = zip(*rows)
+        batch = ResultBatch.from_columns(
+            {'ticker': tickers, **dict(zip(self.COLUMNS, values))}, success=True)
+        return batch, dict(zip(tickers, map(datetime.fromisoformat, fetched_at)))
+
+    def get_many(self, tickers) -> tuple:
+        """Retourne les instantanés connus d'une liste de tickers: (ResultBatch, {ticker: fetched_at})"""
+        tickers = list(tickers)
+        if not tickers:
+            return ResultBatch.empty(), {}
+        with closing(self._connect()) as conn:
+            return self._read_batch(conn, f"ticker IN ({','.join('?' * len(tickers))})", tickers)
+
+    def save_many(self, results: ResultBatch, fetched_at=None) -> int:
+        """Enregistre en une transaction les résultats récupérés avec succès
+        (fetched_at: horodatage ISO commun ou séquence alignée sur le lot)"""
+        if fetched_at is None:
+            fetched_at = datetime.now(timezone.utc).isoformat()
+        if isinstance(fetched_at, str):
+            fetched_at = [fetched_at] * len(results)
+
+        mask = results['success']
+        ok = results.select(mask)
+        if not len(ok):
+            return 0
+        rows = zip(ok.values('ticker'), np.asarray(fetched_at, dtype=object)[mask].tolist(),
+                   *(ok.values(name) for name in self.COLUMNS))
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO snapshots (ticker, fetched_at, {', '.join(self.COLUMNS)}) "
+                f"VALUES ({','.join('?' * (len(self.COLUMNS) + 2))})",
+                rows)
+        return len(ok)
+
+    def query_valuations(self, tickers, max_valuation: float, gf_valuations=None,
+                         limit: int = 10, since=None) -> "ResultBatch":
+        """Sélectionne les instantanés les plus décotés parmi une liste de tickers"""
+        tickers = list(tickers)
+        if not tickers:
+            return ResultBatch.empty()
+        where = f"ticker IN ({','.join('?' * len(tickers))}) AND valuation <= ?"
+        params = [*tickers, max_valuation]
+        if gf_valuations:
+            where += f" AND gf_valuation IN ({','.join('?' * len(gf_valuations))})"
+            params.extend(gf_valuations)
+        if since is not None:
+            where += " AND fetched_at >= ?"
+            params.append(since.isoformat())
+        params.append(limit)
+
+        with closing(self._connect()) as conn:
+            batch, _ = self._read_batch(conn, where, params, "ORDER BY valuation ASC LIMIT ?")
+        return batch
+
+    def get_screener_state(self, universe: str):
+        """Retourne la position de reprise du balayage d'un univers"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT cursor, sweep_started_at FROM screener_state WHERE universe = ?",
+                (universe,)).fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    def set_screener_state(self, universe: str, cursor: int, sweep_started_at):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO screener_state (universe, cursor, sweep_started_at, updated_at) VALUES (?, ?, ?, ?)",
+                (universe, cursor, sweep_started_at, datetime.now(timezone.utc).isoformat()))
+
+
+class FxRateService:
+    """Taux de change quotidiens (référence BCE) mis en cache localement"""
+
+    ECB_DAILY_URL = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-daily.xml"
+
+    def __init__(self, cache_file="gurufocus_fx.json", max_age_hours=12):
+        self.cache_file = Path(cache_file)
+        self.max_age = timedelta(hours=max_age_hours)
+        self._table = self._load()
+
+    def _load(self):
+        """Charge le dernier tableau de taux connu"""
+        if not self.cache_file.exists():
+            return {'fetched_at': None, 'date': None, 'rates': {'EUR': 1.0}}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.error(f"Erreur lors de la lecture du cache des taux de change: {e}")
+            return {'fetched_at': None, 'date': None, 'rates': {'EUR': 1.0}}
+
+    def is_stale(self) -> bool:
+        """Vérifie si le tableau de taux doit être rafraîchi"""
+        fetched_at = self._table.get('fetched_at')
+        return fetched_at is None or datetime.now() - datetime.fromisoformat(fetched_at) > self.max_age
+
+    def refresh(self, force: bool = False) -> bool:
+        """Rafraîchit les taux si nécessaire, en conservant le dernier tableau en cas d'échec"""
+        if not force and not self.is_stale():
+            return True
+        try:
+            response = requests.get(self.ECB_DAILY_URL, timeout=10)
+            response.raise_for_status()
+            rates = {'EUR': 1.0}
+            rates_date = None
+            for cube in ET.fromstring(response.content).iter():
+                if not cube.tag.endswith('Cube'):
+                    continue
+                if 'time' in cube.attrib:
+                    rates_date = cube.attrib['time']
+                if 'currency' in cube.attrib:
+                    rates[cube.attrib['currency']] = float(cube.attrib['rate'])
+
+            self._table = {'fetched_at': datetime.now().isoformat(),
+                           'date': rates_date, 'rates': rates}
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(self._table, f, indent=2)
+            logging.info(f"Taux de change mis à jour ({rates_date}, {len(rates)} devises)")
+            return True
+        except Exception as e:
+            logging.warning(
+                f"Impossible de rafraîchir les taux de change, utilisation du tableau du {self._table.get('date')}: {e}")
+            return False
+
+    @property
+    def rates_date(self):
+        return self._table.get('date')
+
+    def conversion_factors(self, base: str = "EUR") -> pd.Series:
+        """Retourne le facteur de conversion de chaque devise vers la devise de base"""
+        rates = pd.Series(self._table['rates'], dtype='float64')
+        if base not in rates.index:
+            raise ValueError(f"Devise de base inconnue: {base}")
+        # Les taux BCE expriment le nombre d'unités de devise pour 1 EUR
+        return rates[base] / rates
+
+    def convert_frame(self, df: pd.DataFrame, columns: list, base: str = "EUR",
+                      currency_column: str = 'currency') -> pd.DataFrame:
+        """Convertit des colonnes de montants dans la devise de base (NaN si devise inconnue)"""
+        factors = df[currency_column].map(self.conversion_factors(base))
+        converted = df[columns].mul(factors, axis=0)
+        return df.assign(**{f"{column}_{base}": converted[column] for column in columns})
+
+
+class AsyncRateLimiter:
+    """Limiteur de débit asyncio: concurrence maximale et intervalle minimal entre requêtes"""
+
+    def __init__(self, max_concurrency: int = 4, min_interval: float = 0.5):
+        self.min_interval = min_interval
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            async with self._lock:
+                now = asyncio.get_running_loop().time()
+                wait = self._next_slot - now
+                self._next_slot = max(now, self._next_slot) + self.min_interval
+            if wait > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._semaphore.release()
+
+
+# Groupe d'annulation des traitements soumis à la boucle (ex: le thread du planificateur)
+current_cancel_group = contextvars.ContextVar('current_cancel_group', default=None)
+
+
+class AsyncRuntime:
+    """Boucle asyncio dédiée (un seul thread) et pool de connexions HTTP partagé"""
+
+    def __init__(self, max_connections: int = 100):
+        self.max_connections = max_connections
+        self.loop = asyncio.new_event_loop()
+        self._session = None
+        self._rate_limiters = {}
+        # Traitements en vol et leur groupe d'annulation
+        self._futures = {}
+        self._futures_lock = threading.Lock()
+        self.thread = threading.Thread(
+            target=self._run_loop, name="gurufocus-asyncio", daemon=True)
+        self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Retourne la session HTTP partagée (créée dans la boucle au premier appel)"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, ssl=False),
+                cookie_jar=aiohttp.DummyCookieJar(),
+                timeout=aiohttp.ClientTimeout(total=30))
+        return self._session
+
+    def get_rate_limiter(self, name: str, max_concurrency: int = 4, min_interval: float = 0.5) -> AsyncRateLimiter:
+        """Retourne le limiteur de débit partagé d'un service"""
+        if name not in self._rate_limiters:
+            self._rate_limiters[name] = AsyncRateLimiter(max_concurrency, min_interval)
+        return self._rate_limiters[name]
+
+    def run(self, coro, timeout=None):
+        """Exécute une coroutine dans la boucle et attend son résultat (façade synchrone)"""
+        future = asyncio.run_coroutine_threadsafe(
+            self._with_run_id(coro, current_run_id.get()), self.loop)
+        with self._futures_lock:
+            self._futures[future] = current_cancel_group.get()
+        try:
+            return future.result(timeout)
+        finally:
+            with self._futures_lock:
+                self._futures.pop(future, None)
+
+    @staticmethod
+    async def _with_run_id(coro, run_id):
+        # Les tâches de la boucle ne partagent pas le contexte du thread appelant
+        current_run_id.set(run_id)
+        return await coro
+
+    def call_in_loop(self, func, *args):
+        """Exécute une fonction synchrone dans le thread de la boucle et retourne son résultat"""
+        async def _call():
+            return func(*args)
+        return self.run(_call())
+
+    def cancel_group(self, group: str):
+        """Annule les requêtes en cours soumises sous un groupe d'annulation"""
+        with self._futures_lock:
+            futures = [future for future, owner in self._futures.items() if owner == group]
+        for future in futures:
+            future.cancel()
+        if futures:
+            logging.info(f"{len(futures)} traitement(s) asynchrone(s) annulé(s) ({group})")
+
+    def close(self):
+        """Ferme la session HTTP et arrête la boucle"""
+        if self._session is not None and not self._session.closed:
+            asyncio.run_coroutine_threadsafe(self._session.close(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@st.cache_resource
+def get_async_runtime() -> AsyncRuntime:
+    """Retourne la boucle asyncio unique du processus (conservée entre les reruns Streamlit)"""
+    runtime = AsyncRuntime()
+    atexit.register(runtime.close)
+    return runtime
+
+
+class ResponseArchive:
+    """Archive compressée et dédupliquée (par empreinte de contenu) des réponses brutes de l'API"""
+
+    def __init__(self, root_dir="gurufocus_archive", db_file="gurufocus_data.db"):
+        self.objects_dir = Path(root_dir) / "objects"
+        self.db_file = Path(db_file)
+        self.codec = "zst" if zstandard is not None else "gz"
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS archive_index (
+                    ticker TEXT NOT NULL,
+                    endpoint TEXT NOT NULL,
+                    fetched_at TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    codec TEXT NOT NULL
+                )""")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS archive_index_ticker ON archive_index (ticker, endpoint, fetched_at)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS archive_index_digest ON archive_index (digest)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    def _object_path(self, digest: str, codec: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest}.json.{codec}"
+
+    @staticmethod
+    def _compress(content: bytes, codec: str) -> bytes:
+        if codec == "zst":
+            return zstandard.ZstdCompressor(level=10).compress(content)
+        return gzip.compress(content, compresslevel=6)
+
+    @staticmethod
+    def _decompress(content: bytes, codec: str) -> bytes:
+        if codec == "zst":
+            if zstandard is None:
+                raise RuntimeError("Le module zstandard est requis pour lire cette archive")
+            return zstandard.ZstdDecompressor().decompress(content)
+        return gzip.decompress(content)
+
+    def store(self, ticker: str, endpoint: str, payload) -> str:
+        """Archive une réponse; un contenu déjà connu ne coûte qu'une entrée d'index"""
+        try:
+            content = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+            digest = hashlib.sha256(content).hexdigest()
+
+            with closing(self._connect()) as conn:
+                known = conn.execute(
+                    "SELECT codec FROM archive_index WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+            codec = known[0] if known else self.codec
+
+            path = self._object_path(digest, codec)
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # Écriture atomique: un objet présent est toujours complet
+                tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+                tmp_path.write_bytes(self._compress(content, codec))
+                os.replace(tmp_path, path)
+
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT INTO archive_index (ticker, endpoint, fetched_at, digest, codec) VALUES (?, ?, ?, ?, ?)",
+                    (ticker, endpoint, datetime.now(timezone.utc).isoformat(), digest, codec))
+            return digest
+
+        except Exception as e:
+            logging.error(f"Erreur lors de l'archivage de la réponse {endpoint} pour {ticker}: {e}")
+            return None
+
+    def load(self, digest: str, codec: str):
+        """Relit une réponse archivée"""
+        return json.loads(self._decompress(self._object_path(digest, codec).read_bytes(), codec))
+
+    def iter_entries(self, endpoint: str = "valuation", tickers=None, latest_only: bool = True):
+        """Parcourt les entrées d'index: (ticker, fetched_at, payload), triées par ticker et date"""
+        sql = "SELECT ticker, fetched_at, digest, codec FROM archive_index WHERE endpoint = ?"
+        params = [endpoint]
+        if tickers:
+            tickers = list(tickers)
+            sql += f" AND ticker IN ({','.join('?' * len(tickers))})"
+            params.extend(tickers)
+        if latest_only:
+            sql += " AND fetched_at = (SELECT MAX(fetched_at) FROM archive_index AS latest WHERE latest.ticker = archive_index.ticker AND latest.endpoint = archive_index.endpoint)"
+        sql += " ORDER BY ticker, fetched_at"
+
+        with closing(self._connect()) as conn:
+            entries = conn.execute(sql, params).fetchall()
+
+        # Seul le dernier contenu est conservé: les entrées identiques consécutives d'un ticker
+        # ne sont décompressées qu'une fois, sans garder toute l'archive en mémoire
+        last_digest, payload = None, None
+        for ticker, fetched_at, digest, codec in entries:
+            if digest != last_digest:
+                last_digest, payload = digest, self.load(digest, codec)
+            yield ticker, fetched_at, payload
+
+
 class GuruFocusAPI:
     """Classe pour interagir avec l'API GuruFocus"""
 
-    def __init__(self):
+    def __init__(self, runtime: AsyncRuntime = None, archive: ResponseArchive = None):
+        self.runtime = runtime or get_async_runtime()
+        self.rate_limiter = self.runtime.get_rate_limiter("gurufocus")
+        self.archive = archive or ResponseArchive()
         self.bearer_token_cookie_key = "password_grant_custom.client"
         self.gurufocus_api_urls = {
             "valuation": "https://www.gurufocus.com/reader/_api/chart/{symbol}/valuation?v=1.7.19",
@@ -152,17 +1403,28 @@ GmMWJpgYyCBOweSxrI0/zX3UldSFNkuLkEopoGCC94vACWFh8UmxgWO0Grt2KRdZ
 /ezO2PfeST7mHmls1nSwkFMWTtwDYtCxwBsxZ8iVhNmsqYDz78kLSwPPxTeQn97A
 hHciL4ObNe50Rhas94NRsOs9HpvUmrfijmBtpF/Kvt93S7kVEnC/Eg==
 """
-        self.cookies = self._init_cookies()
-
-    def _init_cookies(self):
-        """Initialise les cookies GuruFocus"""
-        try:
-            response = requests.get(
-                "https://www.gurufocus.com/stock/AAPL/summary", verify=False)
-            return response.cookies.get_dict()
-        except Exception as e:
-            logging.error(f"Erreur lors de l'initialisation des cookies: {e}")
-            return {}
+        self.symbol_metadata = SymbolMetadataCache()
+        # Cookies initialisés à la première requête (aucun appel réseau pour les traitements hors ligne)
+        self.cookies = None
+        self._cookies_lock = None
+
+    async def _init_cookies_async(self) -> dict:
+        """Récupère les cookies GuruFocus"""
+        session = await self.runtime.get_session()
+        async with session.get("https://www.gurufocus.com/stock/AAPL/summary") as response:
+            return {name: morsel.value for name, morsel in response.cookies.items()}
+
+    async def _ensure_cookies(self):
+        """Initialise les cookies une seule fois, même sous requêtes concurrentes"""
+        if self._cookies_lock is None:
+            self._cookies_lock = asyncio.Lock()
+        async with self._cookies_lock:
+            if self.cookies is None:
+                try:
+                    self.cookies = await self._init_cookies_async()
+                except Exception as e:
+                    logging.error(f"Erreur lors de l'initialisation des cookies: {e}")
+                    self.cookies = {}
 
     def _generate_signature(self, url: str) -> str:
         """Génère la signature JWT pour l'API"""
@@ -183,122 +1445,643 @@ hHciL4ObNe50Rhas94NRsOs9HpvUmrfijmBtpF/Kvt93S7kVEnC/Eg==
         index_api = chemin.find('_api')
         return chemin[index_api:] if index_api != -1 else None
 
-    def get_stock_data(self, ticker: str) -> dict:
-        """Récupère les données d'une action"""
-        try:
-            url = self.gurufocus_api_urls['valuation'].format(symbol=ticker)
-            signature = self._generate_signature(url)
-
-            headers = {
-                'Authorization': f"Bearer {self.cookies.get(self.bearer_token_cookie_key)}",
-                'Host': 'www.gurufocus.com',
-                'Signature': signature,
-                'Content-Type': 'application/json',
-                'Referer': url,
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36'
-            }
+    def _build_headers(self, url: str) -> dict:
+        """Construit les en-têtes signés d'une requête API"""
+        return {
+            'Authorization': f"Bearer {self.cookies.get(self.bearer_token_cookie_key)}",
+            'Host': 'www.gurufocus.com',
+            'Signature': self._generate_signature(url),
+            'Content-Type': 'application/json',
+            'Referer': url,
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36'
+        }
 
-            response = requests.get(url, headers=headers, verify=False)
-
-            if response.status_code == 200:
-                data = response.json()
-                price = data.get('price', [])
-                last_price = price[-1] if price else []
-                current_price = last_price[1] if len(last_price) > 1 else None
-                gf_value = data.get('gf_value', None)
-
-                valuation = None
-                if gf_value and current_price:
-                    valuation = round(
-                        ((current_price - gf_value) / gf_value) * 100, 2)
-
-                return {
-                    'ticker': ticker,
-                    'gf_value': gf_value,
-                    'current_price': current_price,
-                    'valuation': valuation,
-                    'gf_valuation': data.get('gf_valuation', None),
-                    'earning_growth_5y': data.get('earning_growth_5y', None),
-                    'rvnGrowth5y': data.get('rvnGrowth5y', None),
-                    'success': True
-                }
+    async def _fetch_json(self, url: str, ticker: str = None, endpoint: str = None):
+        """Effectue une requête signée sous le limiteur de débit et retourne (statut, JSON)"""
+        if self.cookies is None:
+            await self._ensure_cookies()
+
+        session = await self.runtime.get_session()
+        async with self.rate_limiter:
+            async with session.get(url, headers=self._build_headers(url)) as response:
+                if response.status != 200:
+                    return response.status, None
+                data = await response.json(content_type=None)
+
+        # Archivage de la réponse brute (compression et écriture hors de la boucle)
+        if self.archive is not None and ticker:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.archive.store, ticker, endpoint, data)
+        return response.status, data
+
+    def parse_valuation(self, ticker: str, data: dict) -> StockResult:
+        """Extrait les champs d'une réponse reçue et enregistre l'observation du symbole"""
+        self.symbol_metadata.observe(ticker, data)
+        return self.extract_valuation(ticker, data, self.symbol_metadata.get(ticker))
+
+    @staticmethod
+    def extract_valuation(ticker: str, data: dict, metadata: dict) -> StockResult:
+        """Extrait les champs utiles d'une réponse de valorisation, sans effet de bord"""
+        price = data.get('price', [])
+        last_price = price[-1] if price else []
+        current_price = last_price[1] if len(last_price) > 1 else None
+        gf_value = data.get('gf_value', None)
+
+        valuation = None
+        if gf_value and current_price:
+            valuation = round(
+                ((current_price - gf_value) / gf_value) * 100, 2)
+
+        return StockResult(
+            ticker=ticker,
+            success=True,
+            current_price=current_price,
+            gf_value=gf_value,
+            valuation=valuation,
+            currency=data.get('currency') or metadata.get('currency'),
+            exchange=metadata.get('exchange'),
+            gf_valuation=data.get('gf_valuation', None),
+            earning_growth_5y=data.get('earning_growth_5y', None),
+            rvnGrowth5y=data.get('rvnGrowth5y', None)
+        )
+
+    async def fetch_valuation_payload_async(self, ticker: str):
+        """Récupère la réponse brute de valorisation d'une action: (statut, JSON)"""
+        url = self.gurufocus_api_urls['valuation'].format(symbol=ticker)
+        return await self._fetch_json(url, ticker, 'valuation')
+
+    async def get_stock_data_async(self, ticker: str) -> StockResult:
+        """Récupère les données d'une action (version asyncio)"""
+        try:
+            started = time.perf_counter()
+            status, data = await self.fetch_valuation_payload_async(ticker)
+            latency_ms = round((time.perf_counter() - started) * 1000)
+
+            if status == 200:
+                logging.info(f"Données récupérées pour {ticker}",
+                             extra={'ticker': ticker, 'latency_ms': latency_ms, 'sample': True})
+                return self.parse_valuation(ticker, data)
             else:
-                logging.error(
-                    f"Erreur API pour {ticker}: {response.status_code}")
-                return {'ticker': ticker, 'success': False, 'error': f"Status: {response.status_code}"}
+                logging.error(f"Erreur API pour {ticker}: {status}",
+                              extra={'ticker': ticker, 'latency_ms': latency_ms})
+                return StockResult(ticker=ticker, error=f"Status: {status}")
 
         except Exception as e:
             logging.error(
                 f"Erreur lors de la récupération des données pour {ticker}: {e}")
-            return {'ticker': ticker, 'success': False, 'error': str(e)}
+            return StockResult(ticker=ticker, error=str(e))
 
+    async def get_many_stock_data_async(self, tickers: list) -> list:
+        """Récupère les données d'un lot d'actions en parallèle sous le limiteur de débit"""
+        return await asyncio.gather(*(self.get_stock_data_async(ticker) for ticker in tickers))
 
-class TelegramBot:
-    """Classe pour gérer l'envoi de messages Telegram"""
+    def get_stock_data(self, ticker: str) -> StockResult:
+        """Récupère les données d'une action"""
+        return self.runtime.run(self.get_stock_data_async(ticker))
 
-    def __init__(self, bot_token: str, chat_id: str):
-        self.bot_token = bot_token
-        self.chat_id = chat_id
+    def get_many_stock_data(self, tickers: list) -> ResultBatch:
+        """Récupère les données d'un lot d'actions (ordre des tickers conservé)"""
+        return ResultBatch.from_records(self.runtime.run(self.get_many_stock_data_async(tickers)))
 
-    def send_message(self, data: list) -> bool:
-        """Envoie un message formaté via Telegram"""
+    async def get_gf_rank_async(self, ticker: str) -> dict:
+        """Récupère le GF Rank d'une action à partir de son symbole MIC mis en cache"""
+        # Méthode client uniquement: la collecte du portfolio et du screener ne l'appelle pas encore
         try:
-            url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-            message = self._build_message(data)
+            url = self.gurufocus_api_urls['gf_rank'].format(
+                mic_symbol=self.symbol_metadata.mic_symbol(ticker))
+            status, data = await self._fetch_json(url, ticker, 'gf_rank')
 
-            payload = {
-                "chat_id": self.chat_id,
-                "text": message,
-                "parse_mode": "HTML"
-            }
+            if status == 200:
+                return {'ticker': ticker, 'gf_rank': data, 'success': True}
+            else:
+                logging.error(f"Erreur API gf_rank pour {ticker}: {status}")
+                return {'ticker': ticker, 'success': False, 'error': f"Status: {status}"}
+
+        except Exception as e:
+            logging.error(
+                f"Erreur lors de la récupération du GF Rank pour {ticker}: {e}")
+            return {'ticker': ticker, 'success': False, 'error': str(e)}
 
-            response = requests.post(
-                url, data=payload, timeout=10, verify=False)
+    def get_gf_rank(self, ticker: str) -> dict:
+        """Récupère le GF Rank d'une action"""
+        return self.runtime.run(self.get_gf_rank_async(ticker))
+
+
+def load_ticker_file(file_path) -> list:
+    """Charge une liste de tickers depuis un CSV (colonne ticker/symbol, sinon première colonne)"""
+    with open(Path(file_path), 'r', encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.reader(f))
+
+    column = 0
+    if rows and any(name.strip().lower() in ('ticker', 'symbol') for name in rows[0]):
+        header = [name.strip().lower() for name in rows[0]]
+        column = header.index('ticker') if 'ticker' in header else header.index('symbol')
+        rows = rows[1:]
+
+    tickers = [row[column].strip().upper() for row in rows if len(row) > column and row[column].strip()]
+    return list(dict.fromkeys(tickers))
+
+
+class UniverseScreener:
+    """Balayage fractionné et reprenable d'un univers de tickers à la recherche de décotes GF Value"""
+
+    def __init__(self, guru_api, snapshot_store: SnapshotStore, market_calendar: MarketCalendar,
+                 settings: ScreenerSettings):
+        self.guru_api = guru_api
+        self.snapshot_store = snapshot_store
+        self.market_calendar = market_calendar
+        self.settings = settings
+        self._universe = None
+
+    def load_universe(self) -> list:
+        """Charge l'univers depuis un CSV (colonne ticker/symbol, sinon première colonne)"""
+        if self._universe is None:
+            self._universe = load_ticker_file(self.settings.universe_file)
+        return self._universe
+
+    @property
+    def universe_key(self) -> str:
+        """Identifiant de l'univers (change si la liste de tickers change)"""
+        digest = hashlib.sha1('\n'.join(self.load_universe()).encode()).hexdigest()[:12]
+        return f"{Path(self.settings.universe_file).name}:{digest}"
+
+    def slice_size(self) -> int:
+        """Nombre de tickers par tranche pour couvrir l'univers en une journée"""
+        slices_per_day = max(1, (24 * 60) // self.settings.slice_interval_minutes)
+        return max(1, math.ceil(len(self.load_universe()) / slices_per_day))
+
+    def run_slice(self) -> int:
+        """Traite la tranche suivante de l'univers et enregistre les résultats"""
+        universe = self.load_universe()
+        if not universe:
+            logging.warning("Univers du screener vide")
+            return 0
+
+        universe_key = self.universe_key
+        cursor, sweep_started_at = self.snapshot_store.get_screener_state(universe_key)
+        if cursor >= len(universe):
+            cursor = 0
+        if cursor == 0:
+            sweep_started_at = datetime.now(timezone.utc).isoformat()
+
+        batch = universe[cursor:cursor + self.slice_size()]
+        metadata = self.guru_api.symbol_metadata.resolve_many(batch)
+        _, fetched_at = self.snapshot_store.get_many(batch)
+        stale = [ticker for ticker in batch
+                 if self.market_calendar.needs_refresh(metadata[ticker], fetched_at.get(ticker))]
+
+        results = self.guru_api.get_many_stock_data(stale)
+        saved = self.snapshot_store.save_many(results)
+        self.guru_api.symbol_metadata.save()
+
+        cursor += len(batch)
+        self.snapshot_store.set_screener_state(universe_key, cursor, sweep_started_at)
+        logging.info(
+            f"Screener: tranche {cursor}/{len(universe)} - {saved}/{len(stale)} récupérés, {len(batch) - len(stale)} à jour")
+        if cursor >= len(universe):
+            logging.info(f"Screener: balayage complet de l'univers ({len(universe)} tickers)")
+        return saved
+
+    def progress(self) -> tuple:
+        """Retourne (position, taille de l'univers, début du balayage)"""
+        cursor, sweep_started_at = self.snapshot_store.get_screener_state(self.universe_key)
+        return cursor, len(self.load_universe()), sweep_started_at
+
+    def top_results(self, settings: ScreenerSettings = None) -> ResultBatch:
+        """Interroge les résultats stockés selon les filtres configurés (ou ceux fournis)"""
+        settings = settings or self.settings
+        since = datetime.now(timezone.utc) - timedelta(days=settings.max_age_days)
+        return self.snapshot_store.query_valuations(
+            self.load_universe(),
+            max_valuation=settings.max_valuation,
+            gf_valuations=settings.gf_valuations,
+            limit=settings.top_n,
+            since=since)
+
+
+class ValuationHistoryStore:
+    """Historique local des séries de valorisation et suivi de l'import par ticker"""
+
+    def __init__(self, db_file="gurufocus_data.db"):
+        self.db_file = Path(db_file)
+        self._write_lock = threading.Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS valuation_history (
+                    ticker TEXT NOT NULL,
+                    series TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    value REAL,
+                    PRIMARY KEY (ticker, series, date)
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS backfill_progress (
+                    ticker TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    rows INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    updated_at TEXT NOT NULL
+                )""")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    @staticmethod
+    def extract_rows(ticker: str, payload: dict) -> list:
+        """Extrait toutes les séries [horodatage, valeur] d'une réponse de valorisation"""
+        rows = []
+        for series, points in payload.items():
+            if not isinstance(points, list):
+                continue
+            for point in points:
+                if not (isinstance(point, list) and len(point) == 2):
+                    break
+                if not isinstance(point[1], (int, float)) or isinstance(point[1], bool):
+                    continue
+                timestamp = point[0]
+                if isinstance(timestamp, (int, float)):
+                    # Horodatages en millisecondes ou en secondes
+                    seconds = timestamp / 1000 if timestamp > 1e11 else timestamp
+                    day = datetime.fromtimestamp(seconds, timezone.utc).date().isoformat()
+                else:
+                    day = str(timestamp)[:10]
+                rows.append((ticker, series, day, float(point[1])))
+        return rows
+
+    def completed_tickers(self, tickers) -> set:
+        """Retourne les tickers dont l'import est déjà terminé"""
+        tickers = list(tickers)
+        if not tickers:
+            return set()
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT ticker FROM backfill_progress WHERE status = 'done' AND ticker IN ({','.join('?' * len(tickers))})",
+                tickers).fetchall()
+        return {ticker for (ticker,) in rows}
+
+    def write_ticker(self, ticker: str, rows: list):
+        """Écrit l'historique d'un ticker et son point de reprise dans une même transaction"""
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO valuation_history (ticker, series, date, value) VALUES (?, ?, ?, ?)",
+                rows)
+            conn.execute(
+                "INSERT OR REPLACE INTO backfill_progress (ticker, status, rows, error, updated_at) VALUES (?, 'done', ?, NULL, ?)",
+                (ticker, len(rows), datetime.now(timezone.utc).isoformat()))
+
+    def mark_failed(self, ticker: str, error: str):
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO backfill_progress (ticker, status, rows, error, updated_at) VALUES (?, 'failed', 0, ?, ?)",
+                (ticker, error, datetime.now(timezone.utc).isoformat()))
+
+
+class ValuationBackfill:
+    """Import parallèle et reprenable de l'historique de valorisation"""
+
+    def __init__(self, guru_api, history_store: ValuationHistoryStore):
+        self.guru_api = guru_api
+        self.history_store = history_store
+
+    def run(self, tickers: list, restart: bool = False) -> dict:
+        """Importe l'historique des tickers non encore traités"""
+        tickers = list(dict.fromkeys(tickers))
+        done = set() if restart else self.history_store.completed_tickers(tickers)
+        pending = [ticker for ticker in tickers if ticker not in done]
+        logging.info(
+            f"Backfill: {len(pending)} tickers à importer, {len(done)} déjà terminés")
 
-            if response.status_code == 200:
-                logging.info("Message Telegram envoyé avec succès")
-                return True
-            else:
-                logging.error(
-                    f"Erreur envoi Telegram: {response.status_code} - {response.text}")
-                return False
+        results = self.guru_api.runtime.run(self._run_async(pending))
+        summary = {'done': sum(results), 'failed': len(results) - sum(results), 'skipped': len(done)}
+        logging.info(f"Backfill terminé: {summary}")
+        return summary
+
+    async def _run_async(self, tickers: list) -> list:
+        return await asyncio.gather(*(self._backfill_ticker(ticker) for ticker in tickers))
+
+    async def _backfill_ticker(self, ticker: str) -> bool:
+        loop = asyncio.get_running_loop()
+        try:
+            status, payload = await self.guru_api.fetch_valuation_payload_async(ticker)
+            if status != 200:
+                raise RuntimeError(f"Status: {status}")
+
+            rows = self.history_store.extract_rows(ticker, payload)
+            # Écriture SQLite hors de la boucle asyncio
+            await loop.run_in_executor(None, self.history_store.write_ticker, ticker, rows)
+            logging.info(f"Backfill: {ticker} importé ({len(rows)} points)",
+                         extra={'ticker': ticker, 'sample': True})
+            return True
 
         except Exception as e:
-            logging.error(f"Erreur lors de l'envoi du message Telegram: {e}")
+            logging.error(f"Backfill: échec pour {ticker}: {e}")
+            await loop.run_in_executor(None, self.history_store.mark_failed, ticker, str(e))
             return False
 
-    def _build_message(self, data: list) -> str:
-        """Construit le message formaté pour Telegram"""
+
+class ScenarioEngine:
+    """Évaluation vectorisée de scénarios de stress de la valorisation GF Value"""
+
+    @staticmethod
+    def build_grid(growth_haircuts, gf_shifts, price_shocks) -> np.ndarray:
+        """Produit cartésien des paramètres: tableau (scénarios, 3)"""
+        mesh = np.meshgrid(np.asarray(growth_haircuts, dtype=float),
+                           np.asarray(gf_shifts, dtype=float),
+                           np.asarray(price_shocks, dtype=float), indexing='ij')
+        return np.stack([axis.ravel() for axis in mesh], axis=1)
+
+    @staticmethod
+    def arrays_from_results(results: ResultBatch) -> dict:
+        """Sélectionne les colonnes utiles des résultats valides"""
+        gf_value = results['gf_value']
+        valid = (results['success'] & ~np.isnan(results['current_price'])
+                 & ~np.isnan(gf_value) & (gf_value != 0))
+        earnings = results['earning_growth_5y'][valid]
+        return {
+            'tickers': results['ticker'][valid],
+            'price': results['current_price'][valid],
+            'gf_value': gf_value[valid],
+            # Croissance bénéficiaire à 5 ans, à défaut celle du chiffre d'affaires (en %)
+            'growth': np.where(np.isnan(earnings), results['rvnGrowth5y'][valid], earnings)
+        }
+
+    @staticmethod
+    def evaluate(price: np.ndarray, gf_value: np.ndarray, growth: np.ndarray,
+                 grid: np.ndarray, horizon_years: float = 1.0) -> np.ndarray:
+        """Valorisations (%) de chaque ticker sous chaque scénario: tableau (scénarios, tickers)"""
+        haircut, gf_shift, price_shock = (grid[:, i:i + 1] for i in range(3))
+        g = np.clip(np.nan_to_num(growth / 100.0), -0.9, None)[np.newaxis, :]
+
+        # La GF Value intègre les perspectives de croissance: une croissance décotée
+        # réduit la valeur intrinsèque de ((1 + g') / (1 + g)) ^ horizon
+        growth_factor = ((1.0 + g * (1.0 - haircut)) / (1.0 + g)) ** horizon_years
+        stressed_gf = gf_value[np.newaxis, :] * (1.0 + gf_shift) * growth_factor
+        stressed_price = price[np.newaxis, :] * (1.0 + price_shock)
+        return (stressed_price - stressed_gf) / stressed_gf * 100.0
+
+    def run(self, results: ResultBatch, settings: ScenarioSettings) -> pd.DataFrame:
+        """Évalue la grille configurée et résume chaque scénario"""
+        arrays = self.arrays_from_results(results)
+        grid = self.build_grid(settings.growth_haircuts, settings.gf_shifts, settings.price_shocks)
+        if arrays['tickers'].size == 0:
+            return pd.DataFrame()
+
+        valuations = self.evaluate(arrays['price'], arrays['gf_value'], arrays['growth'], grid,
+                                   settings.horizon_years)
+        with np.errstate(all='ignore'):
+            worst = np.nanargmax(np.where(np.isnan(valuations), -np.inf, valuations), axis=1)
+        return pd.DataFrame({
+            'Décote croissance': grid[:, 0] * 100,
+            'Choc GF Value': grid[:, 1] * 100,
+            'Choc prix': grid[:, 2] * 100,
+            'Valorisation moyenne': np.nanmean(valuations, axis=1),
+            'Valorisation médiane': np.nanmedian(valuations, axis=1),
+            'Sous-évaluées': (valuations < 0).sum(axis=1),
+            'Plus surévaluée': arrays['tickers'][worst]
+        }).sort_values('Valorisation moyenne', ascending=False, ignore_index=True)
+
+
+@dataclass(slots=True, frozen=True)
+class ReportArtifact:
+    """Rapport rendu dans un format donné pour un instantané"""
+
+    snapshot_id: str
+    fmt: str
+    content: bytes
+    filename: str
+    mime_type: str
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8')
+
+
+class ReportRenderer:
+    """Rend chaque instantané une seule fois par format et conserve les artefacts en mémoire"""
+
+    MIME_TYPES = {'html': 'text/html', 'csv': 'text/csv', 'png': 'image/png'}
+    CSV_COLUMNS = ['ticker', 'exchange', 'currency', 'current_price', 'gf_value', 'valuation',
+                   'gf_valuation', 'in_portfolio', 'quantity']
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._artifacts = OrderedDict()
+        # Un seul rendu à la fois: deux envois simultanés du même instantané partagent l'artefact
+        self._lock = threading.Lock()
+        self._renderers = {'html': self._render_html, 'csv': self._render_csv, 'png': self._render_png}
+
+    def render(self, data: ResultBatch, fmt: str) -> ReportArtifact:
+        """Retourne l'artefact du format demandé, rendu au premier appel puis lu depuis le cache"""
+        if fmt not in self._renderers:
+            raise ValueError(f"Format de rapport inconnu: {fmt}")
+
+        snapshot_id = data.snapshot_id
+        key = (snapshot_id, fmt)
+        with self._lock:
+            artifact = self._artifacts.get(key)
+            if artifact is not None:
+                self._artifacts.move_to_end(key)
+                logging.debug(f"Rapport {fmt} de l'instantané {snapshot_id} réutilisé")
+                return artifact
+
+            # L'artefact ne dépend que des données: l'heure d'envoi est ajoutée par l'expéditeur
+            content = self._renderers[fmt](data)
+            artifact = ReportArtifact(
+                snapshot_id=snapshot_id, fmt=fmt, content=content,
+                filename=f"gurufocus_{snapshot_id[:8]}.{fmt}",
+                mime_type=self.MIME_TYPES[fmt])
+
+            self._artifacts[key] = artifact
+            while len(self._artifacts) > self.max_entries:
+                self._artifacts.popitem(last=False)
+            logging.debug(f"Rapport {fmt} de l'instantané {snapshot_id} rendu ({len(content)} octets)")
+            return artifact
+
+    def _render_html(self, data: ResultBatch) -> bytes:
+        """Tableau <pre> du message Telegram (sans la ligne d'horodatage)"""
         message = "<b>📊 Rapport GuruFocus Portfolio</b>\n\n"
 
         if not data:
             message += "Aucune donnée disponible.\n"
         else:
             message += self._create_telegram_table(data)
+        return message.encode('utf-8')
 
-        message += f"<i>Dernière mise à jour: {datetime.now().strftime('%H:%M %d/%m/%Y')}</i>"
-        return message
-
-    def _create_telegram_table(self, data: list) -> str:
+    @staticmethod
+    def _create_telegram_table(data: ResultBatch) -> str:
         """Crée un tableau formaté pour Telegram"""
         table = """<pre>
-Ticker      | Prix    | GF Val  | %Val   | Pos
-------------|---------|---------|--------|----"""
-
-        for item in data:
-            if item.get('success', False):
-                ticker = item['ticker'][:10]
-                prix = f"{item['current_price']:.2f}" if item['current_price'] else "N/A"
-                gf_val = f"{item['gf_value']:.2f}" if item['gf_value'] else "N/A"
-                valuation = f"{item['valuation']:.1f}%" if item['valuation'] else "N/A"
-                position = "✅" if item.get('in_portfolio', False) else "❌"
-
-                line = f"\n{ticker:<11} | {prix:>7} | {gf_val:>7} | {valuation:>6} | {position}"
-                table += line
+Ticker      | Dev | Prix    | GF Val  | %Val   | Pos
+------------|-----|---------|---------|--------|----"""
+
+        ok = data.successful
+        rows = zip([ticker[:10] for ticker in ok.values('ticker')],
+                   [(currency or "")[:3] for currency in ok.values('currency')],
+                   format_column(ok['current_price'], '.2f'),
+                   format_column(ok['gf_value'], '.2f'),
+                   format_column(ok['valuation'], '.1f', '%'),
+                   np.where(ok['in_portfolio'], "✅", "❌").tolist())
+        table += ''.join(f"\n{ticker:<11} | {devise:<3} | {prix:>7} | {gf_val:>7} | {valuation:>6} | {position}"
+                         for ticker, devise, prix, gf_val, valuation, position in rows)
 
         table += "\n</pre>\n\n"
         return table
 
+    def _render_csv(self, data: ResultBatch) -> bytes:
+        """Export CSV des résultats valides"""
+        df = data.successful.to_frame()[self.CSV_COLUMNS]
+        return df.to_csv(index=False, float_format='%.4f').encode('utf-8')
+
+    @staticmethod
+    def _render_png(data: ResultBatch) -> bytes:
+        """Graphique des valorisations (backend sans affichage, sans pyplot)"""
+        ok = data.successful
+        valuations = ok['valuation']
+        mask = ~np.isnan(valuations)
+        order = np.argsort(valuations[mask])
+        tickers = ok['ticker'][mask][order]
+        values = valuations[mask][order]
+
+        figure = Figure(figsize=(8, 1.5 + 0.3 * max(len(values), 1)))
+        ax = figure.subplots()
+        ax.barh(tickers, values, color=np.where(values < 0, '#2e7d32', '#c62828'))
+        ax.axvline(0, color='black', linewidth=0.8)
+        ax.set_xlabel("Valorisation vs GF Value (%)")
+        ax.set_title("Rapport GuruFocus Portfolio")
+        ax.grid(axis='x', alpha=0.3)
+
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format='png', dpi=120, bbox_inches='tight')
+        return buffer.getvalue()
+
+
+@st.cache_resource
+def get_report_renderer() -> ReportRenderer:
+    """Retourne le cache de rapports partagé par les envois Telegram et l'interface"""
+    return ReportRenderer()
+
+
+class TelegramBot:
+    """Classe pour gérer l'envoi de messages Telegram"""
+
+    def __init__(self, bot_token: str, chat_id: str, runtime: AsyncRuntime = None,
+                 renderer: ReportRenderer = None):
+        self.bot_token = bot_token
+        self.chat_ids = [chat.strip() for chat in str(chat_id).split(',') if chat.strip()]
+        self.runtime = runtime or get_async_runtime()
+        self.renderer = renderer or get_report_renderer()
+
+    def send_message(self, data: ResultBatch, formats=('html',)) -> bool:
+        """Envoie le rapport dans les formats demandés à chaque chat"""
+        try:
+            # Rendu hors de la boucle asyncio (le PNG est coûteux), une fois pour tous les chats
+            artifacts = [self.renderer.render(data, fmt) for fmt in formats]
+            return self.runtime.run(self.send_artifacts_async(artifacts))
+        except Exception as e:
+            logging.error(f"Erreur lors de l'envoi du message Telegram: {e}")
+            return False
+
+    async def send_artifacts_async(self, artifacts: list) -> bool:
+        """Envoie des rapports déjà rendus à tous les chats, en parallèle"""
+        # Horodatage de l'envoi, hors des artefacts mis en cache
+        footer = f"<i>Dernière mise à jour: {datetime.now().strftime('%H:%M %d/%m/%Y')}</i>"
+        results = await asyncio.gather(*(self._send_artifacts_to_chat(chat_id, artifacts, footer)
+                                         for chat_id in self.chat_ids))
+        return bool(results) and all(results)
+
+    def send_screener_report(self, results: ResultBatch, settings: ScreenerSettings) -> bool:
+        """Envoie le classement du screener via Telegram"""
+        try:
+            return self.runtime.run(self._send_text_async(self._build_screener_message(results, settings)))
+        except Exception as e:
+            logging.error(f"Erreur lors de l'envoi du rapport screener: {e}")
+            return False
+
+    def send_scenario_report(self, summary: pd.DataFrame, limit: int = 5) -> bool:
+        """Envoie les scénarios de stress les plus défavorables via Telegram"""
+        try:
+            return self.runtime.run(self._send_text_async(self._build_scenario_message(summary, limit)))
+        except Exception as e:
+            logging.error(f"Erreur lors de l'envoi du rapport de scénarios: {e}")
+            return False
+
+    async def _send_artifacts_to_chat(self, chat_id: str, artifacts: list, footer: str) -> bool:
+        """Envoie les rapports à un chat, dans l'ordre (texte puis pièces jointes)"""
+        success = True
+        for artifact in artifacts:
+            if artifact.fmt == 'html':
+                sent = await self._post_async('sendMessage', {
+                    "chat_id": chat_id, "text": artifact.text + footer, "parse_mode": "HTML"})
+            else:
+                method, field_name = ('sendPhoto', 'photo') if artifact.fmt == 'png' else ('sendDocument', 'document')
+                form = aiohttp.FormData()
+                form.add_field('chat_id', chat_id)
+                form.add_field(field_name, artifact.content,
+                               filename=artifact.filename, content_type=artifact.mime_type)
+                sent = await self._post_async(method, form)
+            success = success and sent
+        return success
+
+    async def _send_text_async(self, message: str) -> bool:
+        """Envoie un texte HTML à tous les chats via l'API Telegram"""
+        results = await asyncio.gather(*(self._post_async('sendMessage', {
+            "chat_id": chat_id, "text": message, "parse_mode": "HTML"}) for chat_id in self.chat_ids))
+        return bool(results) and all(results)
+
+    async def _post_async(self, method: str, payload) -> bool:
+        """Appelle une méthode de l'API Telegram"""
+        try:
+            url = f"https://api.telegram.org/bot{self.bot_token}/{method}"
+
+            session = await self.runtime.get_session()
+            async with session.post(url, data=payload, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                if response.status == 200:
+                    logging.info(f"Telegram {method} envoyé avec succès")
+                    return True
+                else:
+                    logging.error(
+                        f"Erreur envoi Telegram ({method}): {response.status} - {await response.text()}")
+                    return False
+
+        except Exception as e:
+            logging.error(f"Erreur lors de l'envoi Telegram ({method}): {e}")
+            return False
+
+    def _build_scenario_message(self, summary: pd.DataFrame, limit: int) -> str:
+        """Construit le message des scénarios les plus défavorables"""
+        message = f"<b>🧪 Scénarios de stress ({len(summary)} combinaisons)</b>\n\n"
+        table = """<pre>
+Décote | GF    | Prix  | Moy.   | Sous-év
+-------|-------|-------|--------|--------"""
+        for row in summary.head(limit).itertuples(index=False):
+            table += (f"\n{row[0]:>5.0f}% | {row[1]:>+4.0f}% | {row[2]:>+4.0f}% | "
+                      f"{row[3]:>5.1f}% | {row[5]:>7}")
+        message += table + "\n</pre>\n\n"
+        message += f"<i>Dernière mise à jour: {datetime.now().strftime('%H:%M %d/%m/%Y')}</i>"
+        return message
+
+    def _build_screener_message(self, results: ResultBatch, settings: ScreenerSettings) -> str:
+        """Construit le message du screener pour Telegram"""
+        message = f"<b>🔎 Screener GF Value (valorisation ≤ {settings.max_valuation:.0f}%)</b>\n\n"
+
+        if not results:
+            message += "Aucune action ne correspond aux critères.\n"
+        else:
+            table = """<pre>
+Ticker      | Dev | Prix    | GF Val  | %Val
+------------|-----|---------|---------|-------"""
+            rows = zip([ticker[:10] for ticker in results.values('ticker')],
+                       [(currency or "")[:3] for currency in results.values('currency')],
+                       format_column(results['current_price'], '.2f'),
+                       format_column(results['gf_value'], '.2f'),
+                       results['valuation'].tolist())
+            table += ''.join(f"\n{ticker:<11} | {devise:<3} | {prix:>7} | {gf_val:>7} | {valuation:>5.1f}%"
+                             for ticker, devise, prix, gf_val, valuation in rows)
+            message += table + "\n</pre>\n\n"
+
+        message += f"<i>Dernière mise à jour: {datetime.now().strftime('%H:%M %d/%m/%Y')}</i>"
+        return message
+
 
 class BackgroundScheduler:
     """Gestionnaire de planification en arrière-plan persistant avec verrou d'exécution"""
@@ -321,6 +2104,7 @@ class BackgroundScheduler:
             self.schedule_times = []
             self.callback_func = None
             self.config_manager = None
+            self.cancel_group = None
             # Verrou pour éviter les exécutions multiples
             self.execution_lock = threading.Lock()
             self._initialized = True
@@ -329,7 +2113,7 @@ class BackgroundScheduler:
         """Définit le gestionnaire de configuration"""
         self.config_manager = config_manager
 
-    def start_scheduler(self, execution_times: list, callback_func, config_manager):
+    def start_scheduler(self, execution_times: list, callback_func, config_manager, interval_jobs=None):
         """Démarre le planificateur en arrière-plan"""
         if self.running:
             self.stop_scheduler()
@@ -379,6 +2163,11 @@ class BackgroundScheduler:
             schedule.every().day.at(time_str).do(safe_callback)
             logging.info(f"Job programmé à {time_str}")
 
+        # Jobs périodiques (ex: tranches du screener), indépendants du verrou d'exécution
+        for minutes, job_func in interval_jobs or []:
+            schedule.every(minutes).minutes.do(job_func)
+            logging.info(f"Job périodique programmé toutes les {minutes} minutes")
+
         self.schedule_times = execution_times
         self.callback_func = callback_func
         self.config_manager = config_manager
@@ -387,8 +2176,9 @@ class BackgroundScheduler:
         # Marquer le planificateur comme actif dans la config
         self.config_manager.update_scheduler_status(running=True)
 
-        # Démarrer le thread
-        self.thread = threading.Thread(target=self._run_scheduler, daemon=True)
+        # Démarrer le thread (ses traitements asynchrones forment un groupe annulable à l'arrêt)
+        self.cancel_group = f"scheduler-{uuid.uuid4().hex[:6]}"
+        self.thread = threading.Thread(target=self._run_scheduler, args=(self.cancel_group,), daemon=True)
         self.thread.start()
 
         logging.info(
@@ -407,6 +2197,10 @@ class BackgroundScheduler:
         self.running = False
         schedule.clear()
 
+        # Annuler les requêtes réseau du planificateur encore en vol (pas celles des autres sessions)
+        if self.cancel_group:
+            get_async_runtime().cancel_group(self.cancel_group)
+
         # Marquer le planificateur comme inactif dans la config
         if self.config_manager:
             self.config_manager.update_scheduler_status(
@@ -476,8 +2270,9 @@ class BackgroundScheduler:
 
         return min(today_executions) if today_executions else None
 
-    def _run_scheduler(self):
+    def _run_scheduler(self, cancel_group: str):
         """Boucle principale du planificateur"""
+        current_cancel_group.set(cancel_group)
         logging.info("Thread du planificateur démarré")
 
         while self.running:
@@ -504,30 +2299,110 @@ class BackgroundScheduler:
 background_scheduler = BackgroundScheduler()
 
 
+def new_run_id() -> str:
+    """Génère un identifiant d'exécution horodaté"""
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+class RunProfiler:
+    """Profilage à la demande d'une exécution (cProfile), sans surcoût lorsqu'il est désactivé"""
+
+    def __init__(self, output_dir="profiles", runtime: AsyncRuntime = None):
+        self.output_dir = Path(output_dir)
+        self.runtime = runtime
+
+    @contextmanager
+    def profile(self, run_id: str, enabled: bool):
+        """Profile le bloc si activé et enregistre le résultat sous profiles/<run_id>.prof"""
+        if not enabled:
+            yield None
+            return
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Un autre profilage est déjà en cours (exécution concurrente)
+            logging.warning(f"Profilage de l'exécution {run_id} ignoré: {e}")
+            yield None
+            return
+
+        # Le décodage JSON et la signature JWT s'exécutent dans le thread asyncio
+        loop_profiler = cProfile.Profile() if self.runtime else None
+        if loop_profiler:
+            try:
+                self.runtime.call_in_loop(loop_profiler.enable)
+            except ValueError:
+                # Python 3.12+: un seul profileur actif, qui couvre déjà tous les threads
+                loop_profiler = None
+
+        path = self.output_dir / f"{run_id}.prof"
+        try:
+            yield path
+        finally:
+            profiler.disable()
+            if loop_profiler:
+                self.runtime.call_in_loop(loop_profiler.disable)
+
+            self.output_dir.mkdir(exist_ok=True)
+            stats = pstats.Stats(profiler)
+            if loop_profiler:
+                stats.add(loop_profiler)
+            stats.dump_stats(path)
+            logging.info(f"Profil de l'exécution {run_id} enregistré dans {path}")
+
+    @staticmethod
+    def top_functions(path, limit: int = 25) -> pd.DataFrame:
+        """Retourne les fonctions les plus coûteuses par temps cumulé"""
+        stats = pstats.Stats(str(path))
+        rows = [{
+            'Fonction': f"{Path(filename).name}:{line}({name})",
+            'Appels': str(primitive_calls) if primitive_calls == total_calls else f"{total_calls}/{primitive_calls}",
+            'Temps propre (s)': round(tottime, 4),
+            'Temps cumulé (s)': round(cumtime, 4)
+        } for (filename, line, name), (primitive_calls, total_calls, tottime, cumtime, _) in stats.stats.items()]
+        rows.sort(key=lambda row: row['Temps cumulé (s)'], reverse=True)
+        return pd.DataFrame(rows[:limit])
+
+
 class GuruFocusApp:
     """Application principale"""
 
-    def __init__(self):
+    def __init__(self, profile: bool = False):
         self.config_manager = ConfigManager()
         self.guru_api = GuruFocusAPI()
+        self.snapshot_store = SnapshotStore()
+        self.fx_service = FxRateService()
         self.scheduler = background_scheduler
         self.telegram_bot = None
 
         # Initialiser la configuration depuis le cache persistant
-        self.config = self.config_manager.get_config()
+        self.config = self.config_manager.get_app_config()
+        self.market_calendar = MarketCalendar(self.config.schedule.holidays)
+        self.base_currency = self.config.fx.base_currency
+        self.screener = UniverseScreener(
+            self.guru_api, self.snapshot_store, self.market_calendar, self.config.screener)
+        self.profiler = RunProfiler(runtime=self.guru_api.runtime)
+        self.scenario_engine = ScenarioEngine()
+        self.report_renderer = get_report_renderer()
+        # Profilage demandé en ligne de commande (--profile) ou dans la configuration
+        self.profile = profile or self.config.debug.profile
 
+        # Configurer le planificateur avec le gestionnaire de config
+        self.scheduler.set_config_manager(self.config_manager)
+
+    def run(self):
+        """Lance l'application Streamlit"""
         # Initialiser les states pour l'interface seulement
         if 'last_execution' not in st.session_state:
             st.session_state.last_execution = None
 
         if 'portfolio_data' not in st.session_state:
-            st.session_state.portfolio_data = []
+            st.session_state.portfolio_data = ResultBatch.empty()
 
-        # Configurer le planificateur avec le gestionnaire de config
-        self.scheduler.set_config_manager(self.config_manager)
+        if 'last_profile' not in st.session_state:
+            st.session_state.last_profile = None
 
-    def run(self):
-        """Lance l'application Streamlit"""
         st.set_page_config(
             page_title="GuruFocus Bot",
             page_icon="📊",
@@ -558,6 +2433,10 @@ class GuruFocusApp:
             st.header("📊 Statistiques")
             self._render_stats_section()
 
+        if self.config.screener.enabled:
+            st.header("🔎 Screener")
+            self._render_screener_section()
+
         # Section des logs
         st.header("📜 Logs")
         self._render_logs_section()
@@ -566,34 +2445,35 @@ class GuruFocusApp:
         """Affiche la section de configuration"""
         st.subheader("📁 Importer Configuration")
 
+        if self.config_manager.validation_error:
+            st.error(self.config_manager.validation_error)
+
         # Vérifier si une configuration existe
-        config_exists = (self.config.get('telegram', {}).get('bot_token') or
-                         self.config.get('portfolio'))
+        config_exists = self.config.telegram.bot_token or self.config.portfolio
 
         if config_exists:
             st.success("✅ Configuration chargée")
 
             # Afficher un résumé de la configuration
             with st.expander("Voir le résumé de la configuration"):
-                telegram_config = self.config.get('telegram', {})
-                portfolio_config = self.config.get('portfolio', [])
-                schedule_config = self.config.get('schedule', {})
+                telegram_config = self.config.telegram
 
                 st.write("**Telegram:**")
                 st.write(
-                    f"- Bot Token: {'✅ Configuré' if telegram_config.get('bot_token') else '❌ Non configuré'}")
+                    f"- Bot Token: {'✅ Configuré' if telegram_config.bot_token else '❌ Non configuré'}")
                 st.write(
-                    f"- Chat ID: {telegram_config.get('chat_id', 'Non configuré')}")
+                    f"- Chat ID: {', '.join(telegram_config.chat_ids) or 'Non configuré'}")
+                st.write(
+                    f"- Formats du rapport: {', '.join(telegram_config.report_formats)}")
 
                 st.write("**Portfolio:**")
-                st.write(f"- Nombre d'actions: {len(portfolio_config)}")
-                if portfolio_config:
-                    tickers = [p['ticker'] for p in portfolio_config]
-                    st.write(f"- Tickers: {', '.join(tickers)}")
+                st.write(f"- Nombre d'actions: {len(self.config.portfolio)}")
+                if self.config.portfolio:
+                    st.write(f"- Tickers: {', '.join(self.config.tickers)}")
 
                 st.write("**Planification:**")
-                execution_times = schedule_config.get('execution_times', [])
-                st.write(f"- Heures d'exécution: {', '.join(execution_times)}")
+                st.write(
+                    f"- Heures d'exécution: {', '.join(self.config.schedule.execution_times)}")
         else:
             st.info(
                 "ℹ️ Aucune configuration chargée. Veuillez importer un fichier de configuration.")
@@ -610,19 +2490,20 @@ class GuruFocusApp:
 
             if success:
                 # Recharger la configuration
-                self.config = self.config_manager.get_config()
+                self.config = self.config_manager.get_app_config()
                 st.success(message)
             else:
                 st.error(message)
 
         # Test Telegram (seulement si configuré)
-        telegram_config = self.config.get('telegram', {})
-        if telegram_config.get('bot_token') and telegram_config.get('chat_id'):
+        telegram_config = self.config.telegram
+        if telegram_config.is_configured:
             if st.button("🧪 Tester Telegram"):
                 bot = TelegramBot(
-                    telegram_config['bot_token'], telegram_config['chat_id'])
-                test_data = [{'ticker': 'TEST', 'success': True, 'current_price': 100.0,
-                              'gf_value': 95.0, 'valuation': 5.3, 'in_portfolio': True}]
+                    telegram_config.bot_token, telegram_config.chat_id)
+                test_data = ResultBatch.from_records([StockResult(
+                    ticker='TEST', success=True, current_price=100.0, currency='USD',
+                    gf_value=95.0, valuation=5.3, in_portfolio=True)])
                 if bot.send_message(test_data):
                     st.success("Message de test envoyé avec succès!")
                 else:
@@ -630,13 +2511,12 @@ class GuruFocusApp:
 
     def _render_scheduler_section(self):
         """Affiche la section du planificateur avec statut persistant"""
-        if not self.config.get('telegram', {}).get('bot_token'):
+        if not self.config.telegram.bot_token:
             st.warning(
                 "⚠️ Configuration Telegram manquante. Importez d'abord une configuration.")
             return
 
-        current_times = self.config.get('schedule', {}).get(
-            'execution_times', ['07:25', '19:35'])
+        current_times = self.config.schedule.execution_times
 
         # Récupérer le statut détaillé
         status_info = self.scheduler.get_execution_status()
@@ -690,9 +2570,11 @@ class GuruFocusApp:
 
         # Test manuel
         st.markdown("---")
+        force_refresh = st.checkbox(
+            "Forcer le rafraîchissement", help="Ignore les instantanés et interroge l'API pour tous les tickers")
         if st.button("🚀 Exécuter Maintenant", disabled=execution_in_progress):
             with st.spinner("Analyse en cours..."):
-                self._execute_portfolio_analysis()
+                self._execute_portfolio_analysis(force_refresh=force_refresh)
                 st.success("Analyse terminée!")
 
         # Debug
@@ -702,35 +2584,41 @@ class GuruFocusApp:
             st.write(f"Exécution en cours: {execution_in_progress}")
             st.write(f"Jobs programmés: {len(schedule.jobs)}")
 
+            st.toggle("⏱️ Profiler l'exécution manuelle", key='profile_enabled',
+                      value=self.profile,
+                      help="Enregistre un profil cProfile de la prochaine analyse (profiles/<run_id>.prof)")
+
+            if st.session_state.last_profile and Path(st.session_state.last_profile).exists():
+                st.write(f"Dernier profil: `{st.session_state.last_profile}`")
+                st.dataframe(
+                    RunProfiler.top_functions(
+                        st.session_state.last_profile, self.config.debug.profile_top_n),
+                    use_container_width=True, hide_index=True)
+
     def _render_portfolio_section(self):
         """Affiche la section du portfolio"""
         # Vérifier si une configuration existe
-        if not self.config.get('portfolio'):
+        if not self.config.portfolio:
             st.info(
                 "ℹ️ Aucun portfolio configuré. Importez d'abord une configuration.")
             return
 
         # Affichage du portfolio (lecture seule)
-        portfolio = self.config.get('portfolio', [])
-        print(portfolio)
+        portfolio = self.config.portfolio
         if portfolio:
             st.subheader("📊 Portfolio configuré")
 
-            # Convertir en DataFrame pour affichage
-            df = pd.DataFrame(portfolio)
-            print(df)
-            df['Statut'] = df['in_portfolio'].apply(
-                lambda x: '✅ Dans portfolio' if x else '❌ Hors portfolio')
-
             # Afficher le tableau en lecture seule
-            display_df = df[['ticker', 'Statut']].rename(
-                columns={'ticker': 'Ticker'})
+            display_df = pd.DataFrame({
+                'Ticker': [entry.ticker for entry in portfolio],
+                'Statut': ['✅ Dans portfolio' if entry.in_portfolio else '❌ Hors portfolio'
+                           for entry in portfolio]
+            })
             st.dataframe(display_df, use_container_width=True, hide_index=True)
 
             # Statistiques du portfolio
             total_stocks = len(portfolio)
-            portfolio_stocks = len(
-                [p for p in portfolio if p.get('in_portfolio', False)])
+            portfolio_stocks = self.config.held_count
 
             col1, col2 = st.columns(2)
             with col1:
@@ -742,75 +2630,210 @@ class GuruFocusApp:
         if st.session_state.portfolio_data:
             st.subheader("📈 Dernières données récupérées")
 
-            # Convertir en DataFrame pour affichage
-            display_data = []
-            for item in st.session_state.portfolio_data:
-                if item.get('success', False):
-                    valuation_color = "🟢" if item.get(
-                        'valuation', 0) < 0 else "🔴"
-                    display_data.append({
-                        'Ticker': item['ticker'],
-                        'Prix Actuel': f"${item.get('current_price', 0):.2f}",
-                        'Valeur GF': f"${item.get('gf_value', 0):.2f}",
-                        'Valorisation': f"{valuation_color} {item.get('valuation', 0):.1f}%",
-                        'Portfolio': "✅" if item.get('in_portfolio', False) else "❌"
-                    })
-
-            if display_data:
-                st.dataframe(pd.DataFrame(display_data),
-                             use_container_width=True, hide_index=True)
+            # Construire l'affichage à partir des colonnes du lot
+            data = st.session_state.portfolio_data.successful
+            if len(data):
+                currencies = data['currency']
+                display_df = pd.DataFrame({
+                    'Ticker': data['ticker'],
+                    'Prix Actuel': [format_price(v, c) for v, c in zip(data['current_price'], currencies)],
+                    'Valeur GF': [format_price(v, c) for v, c in zip(data['gf_value'], currencies)],
+                    'Valorisation': ["N/A" if np.isnan(v) else f"{'🟢' if v < 0 else '🔴'} {v:.1f}%"
+                                     for v in data['valuation']],
+                    'Portfolio': np.where(data['in_portfolio'], "✅", "❌")
+                })
+                st.dataframe(display_df, use_container_width=True, hide_index=True)
 
                 # Timestamp de la dernière mise à jour
                 if st.session_state.last_execution:
                     st.caption(
                         f"Dernière mise à jour: {st.session_state.last_execution.strftime('%d/%m/%Y à %H:%M')}")
+
+                self._render_report_actions(st.session_state.portfolio_data)
             else:
                 st.warning(
                     "Aucune donnée valide récupérée lors de la dernière exécution.")
 
+    def _render_report_actions(self, batch: ResultBatch):
+        """Téléchargement et renvoi du dernier rapport (artefacts mis en cache par instantané)"""
+        formats = [fmt for fmt in REPORT_FORMATS if fmt != 'html']
+        columns = st.columns(len(formats) + 1)
+        for column, fmt in zip(columns, formats):
+            artifact = self.report_renderer.render(batch, fmt)
+            with column:
+                st.download_button(f"⬇️ {fmt.upper()}", data=artifact.content,
+                                   file_name=artifact.filename, mime=artifact.mime_type,
+                                   key=f"download_{fmt}")
+
+        telegram_config = self.config.telegram
+        with columns[-1]:
+            if st.button("📨 Renvoyer", disabled=not telegram_config.is_configured,
+                         help="Renvoie le dernier rapport sur Telegram sans nouvel appel à l'API"):
+                bot = TelegramBot(telegram_config.bot_token, telegram_config.chat_id)
+                if bot.send_message(batch, telegram_config.report_formats):
+                    st.success("Rapport renvoyé")
+                else:
+                    st.error("Erreur lors du renvoi du rapport")
+
     def _render_stats_section(self):
         """Affiche la section des statistiques"""
         if st.session_state.portfolio_data:
-            successful_data = [
-                d for d in st.session_state.portfolio_data if d.get('success', False)]
+            successful_data = st.session_state.portfolio_data.successful
 
-            if successful_data:
+            if len(successful_data):
                 # Statistiques générales
                 total_stocks = len(successful_data)
-                portfolio_stocks = len(
-                    [d for d in successful_data if d.get('in_portfolio', False)])
+                portfolio_stocks = int(successful_data['in_portfolio'].sum())
 
                 st.metric("Total Actions", total_stocks)
                 st.metric("Dans Portfolio", portfolio_stocks)
 
                 # Valorisation moyenne
-                valuations = [d.get('valuation', 0) for d in successful_data if d.get(
-                    'valuation') is not None]
-                if valuations:
-                    avg_valuation = sum(valuations) / len(valuations)
-                    st.metric("Valorisation Moyenne", f"{avg_valuation:.1f}%")
+                valuations = successful_data['valuation']
+                valuations = valuations[~np.isnan(valuations)]
+                if valuations.size:
+                    st.metric("Valorisation Moyenne", f"{valuations.mean():.1f}%")
 
                 # Actions sous-évaluées
-                undervalued = len([v for v in valuations if v < 0])
+                undervalued = int((valuations < 0).sum())
                 st.metric("Actions Sous-évaluées", undervalued)
 
+                self._render_portfolio_value_metrics(successful_data)
+                self._render_scenario_section(successful_data)
+
         # Dernière exécution
         if st.session_state.last_execution:
             st.metric("Dernière Exécution",
                       st.session_state.last_execution.strftime('%H:%M'))
 
+    def _render_scenario_section(self, successful_data: ResultBatch):
+        """Affiche l'analyse de scénarios de stress sur les derniers résultats"""
+        with st.expander("🧪 Scénarios de stress"):
+            defaults = self.config.scenarios
+
+            def parse_percentages(label, values):
+                text = st.text_input(label, ", ".join(f"{v * 100:g}" for v in values))
+                try:
+                    return [float(v) / 100 for v in text.split(',') if v.strip()]
+                except ValueError:
+                    st.error(f"{label}: liste de pourcentages invalide")
+                    return values
+
+            settings = ScenarioSettings(
+                growth_haircuts=parse_percentages("Décotes de croissance (%)", defaults.growth_haircuts),
+                gf_shifts=parse_percentages("Chocs GF Value (%)", defaults.gf_shifts),
+                price_shocks=parse_percentages("Chocs de prix (%)", defaults.price_shocks),
+                horizon_years=defaults.horizon_years)
+
+            summary = self.scenario_engine.run(successful_data, settings)
+            if summary.empty:
+                st.info("Aucune donnée exploitable pour les scénarios.")
+                return
+
+            worst = summary.iloc[0]
+            st.metric("Pire valorisation moyenne", f"{worst['Valorisation moyenne']:.1f}%")
+            st.dataframe(summary.round(1), use_container_width=True, hide_index=True)
+
+    def _render_portfolio_value_metrics(self, successful_data: ResultBatch):
+        """Affiche les métriques du portefeuille converties dans la devise de base"""
+        if np.isnan(successful_data['quantity']).all():
+            return
+        df = successful_data.to_frame()
+
+        base = self.base_currency
+        try:
+            df = self.fx_service.convert_frame(
+                df, ['current_price', 'gf_value'], base)
+        except ValueError as e:
+            st.warning(f"Conversion impossible: {e}")
+            return
+
+        quantities = df['quantity'].fillna(0)
+        price_base = df[f'current_price_{base}']
+        gf_base = df[f'gf_value_{base}']
+        market_value = (price_base * quantities).sum()
+        st.metric(f"Valeur Portefeuille ({base})", f"{market_value:,.0f}")
+
+        # Valorisation pondérée sur les seules lignes disposant du prix et de la GF Value
+        complete = price_base.notna() & gf_base.notna()
+        gf_total = (gf_base[complete] * quantities[complete]).sum()
+        if gf_total:
+            complete_value = (price_base[complete] * quantities[complete]).sum()
+            weighted_valuation = (complete_value - gf_total) / gf_total * 100
+            st.metric("Valorisation Pondérée", f"{weighted_valuation:.1f}%")
+
+        unconvertible = ((df['current_price'].notna() & price_base.isna())
+                         | (df['gf_value'].notna() & gf_base.isna()))
+        missing = df.loc[unconvertible, 'ticker'].tolist()
+        if missing:
+            st.caption(f"Devise non convertible pour: {', '.join(missing)}")
+        incomplete = df.loc[~complete & ~unconvertible, 'ticker'].tolist()
+        if incomplete:
+            st.caption(f"Prix ou GF Value manquant (exclus de la valorisation pondérée): {', '.join(incomplete)}")
+        if self.fx_service.rates_date:
+            st.caption(f"Taux de change BCE du {self.fx_service.rates_date}")
+
+    def _render_screener_section(self):
+        """Affiche l'avancement du balayage et le classement du screener"""
+        try:
+            cursor, total, sweep_started_at = self.screener.progress()
+            results = self.screener.top_results()
+        except Exception as e:
+            st.error(f"Erreur lors de la lecture du screener: {e}")
+            return
+
+        st.progress(min(cursor / total, 1.0) if total else 0.0,
+                    text=f"Balayage: {cursor}/{total} tickers")
+        if sweep_started_at:
+            st.caption(
+                f"Balayage commencé le {datetime.fromisoformat(sweep_started_at).astimezone():%d/%m/%Y à %H:%M}")
+
+        if len(results):
+            currencies = results['currency']
+            st.dataframe(pd.DataFrame({
+                'Ticker': results['ticker'],
+                'Prix Actuel': [format_price(v, c) for v, c in zip(results['current_price'], currencies)],
+                'Valeur GF': [format_price(v, c) for v, c in zip(results['gf_value'], currencies)],
+                'Valorisation': [f"{v:.1f}%" for v in results['valuation'].tolist()],
+                'Catégorie GF': results['gf_valuation']
+            }), use_container_width=True, hide_index=True)
+        else:
+            st.info("Aucune action ne correspond aux critères du screener.")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("⏭️ Traiter une tranche"):
+                with st.spinner("Balayage en cours..."):
+                    self._run_screener_slice()
+                st.rerun()
+        with col2:
+            if st.button("📤 Envoyer le classement", disabled=not self.config.telegram.is_configured):
+                bot = TelegramBot(self.config.telegram.bot_token, self.config.telegram.chat_id)
+                if self._send_screener_report(bot, self.config.screener):
+                    st.success("Classement envoyé!")
+                else:
+                    st.error("Erreur lors de l'envoi du classement")
+
     def _render_logs_section(self):
         """Affiche la section des logs"""
         if st.button("Rafraîchir les logs"):
             st.rerun()
 
         try:
-            if os.path.exists('gurufocus_bot.log'):
-                with open('gurufocus_bot.log', 'r') as f:
+            if os.path.exists(LOG_FILE):
+                with open(LOG_FILE, 'r', encoding='utf-8') as f:
                     logs = f.read()
 
                 # Afficher les dernières lignes
-                log_lines = logs.split('\n')[-20:]  # 20 dernières lignes
+                log_lines = []
+                for line in logs.splitlines()[-20:]:  # 20 dernières lignes
+                    try:
+                        entry = json.loads(line)
+                        context = f" [{entry['run_id']}]" if entry.get('run_id') else ""
+                        log_lines.append(
+                            f"{entry['ts']} - {entry['level']}{context} - {entry['message']}")
+                    except (ValueError, KeyError):
+                        log_lines.append(line)
                 st.text_area("Logs récents", '\n'.join(log_lines), height=200)
             else:
                 st.info("Aucun fichier de log trouvé")
@@ -820,15 +2843,13 @@ class GuruFocusApp:
     def _start_background_scheduler(self) -> bool:
         """Démarre le planificateur en arrière-plan"""
         try:
-            execution_times = self.config.get(
-                'schedule', {}).get('execution_times', [])
+            execution_times = self.config.schedule.execution_times
             if not execution_times:
                 logging.error("Aucune heure d'exécution configurée")
                 return False
 
             # Vérifier la configuration Telegram
-            telegram_config = self.config.get('telegram', {})
-            if not telegram_config.get('bot_token') or not telegram_config.get('chat_id'):
+            if not self.config.telegram.is_configured:
                 logging.error("Configuration Telegram incomplète")
                 return False
 
@@ -837,9 +2858,14 @@ class GuruFocusApp:
                 logging.info("Exécution programmée déclenchée")
                 self._execute_portfolio_analysis_background()
 
+            interval_jobs = []
+            if self.config.screener.enabled:
+                interval_jobs.append(
+                    (self.config.screener.slice_interval_minutes, self._run_screener_slice))
+
             # Démarrer le planificateur
             success = self.scheduler.start_scheduler(
-                execution_times, execute_with_config, self.config_manager)
+                execution_times, execute_with_config, self.config_manager, interval_jobs)
 
             if success:
                 logging.info("Planificateur démarré avec succès")
@@ -854,82 +2880,178 @@ class GuruFocusApp:
 
     def _execute_portfolio_analysis_background(self):
         """Exécute l'analyse du portfolio en arrière-plan"""
+        with run_context(new_run_id()) as run_id, self.profiler.profile(run_id, self.profile):
+            self._analyze_portfolio_background()
+
+    def _analyze_portfolio_background(self):
+        """Récupère les données du portfolio et envoie les rapports"""
         try:
             logging.info("=== DÉBUT ANALYSE PORTFOLIO (ARRIÈRE-PLAN) ===")
 
             # Récupérer la configuration depuis le fichier
-            current_config = self.config_manager.get_config()
-            portfolio = current_config.get('portfolio', [])
+            current_config = self.config_manager.get_app_config()
+            self._send_portfolio_reports(current_config)
 
-            if not portfolio:
-                logging.warning("Aucun ticker dans le portfolio")
-                return
+            # Rapport du screener, calculé sur les résultats stockés (rafraîchis par les tranches,
+            # indépendamment des séances des marchés du portfolio)
+            telegram_config = current_config.telegram
+            if current_config.screener.enabled and telegram_config.is_configured:
+                bot = TelegramBot(telegram_config.bot_token, telegram_config.chat_id)
+                self._send_screener_report(bot, current_config.screener)
 
-            logging.info(f"Analyse de {len(portfolio)} tickers")
+            logging.info("=== FIN ANALYSE PORTFOLIO (ARRIÈRE-PLAN) ===")
 
-            # Récupérer les données
-            portfolio_data = []
-            for stock in portfolio:
-                ticker = stock['ticker']
-                logging.info(f"Récupération des données pour {ticker}")
-                data = self.guru_api.get_stock_data(ticker)
-                data['in_portfolio'] = stock.get('in_portfolio', False)
-                portfolio_data.append(data)
-                time.sleep(1)  # Pause entre les requêtes
-
-            # Compter les succès
-            successful_data = [
-                d for d in portfolio_data if d.get('success', False)]
+        except CancelledError:
+            logging.warning("Analyse du portfolio annulée (arrêt du planificateur)")
+        except Exception as e:
+            logging.error(
+                f"Erreur lors de l'analyse du portfolio (arrière-plan): {e}", exc_info=True)
+
+    def _send_portfolio_reports(self, current_config: AppConfig):
+        """Récupère les données du portfolio et envoie le rapport et les scénarios"""
+        portfolio = current_config.portfolio
+
+        if not portfolio:
+            logging.warning("Aucun ticker dans le portfolio")
+            return
+
+        logging.info(f"Analyse de {len(portfolio)} tickers")
+
+        # Récupérer les données (instantanés réutilisés si le marché n'a pas coté)
+        portfolio_data, refreshed = self._collect_portfolio_data(portfolio)
+
+        if refreshed == 0 and current_config.schedule.skip_unchanged:
             logging.info(
-                f"Données récupérées avec succès pour {len(successful_data)}/{len(portfolio_data)} tickers")
+                "Aucun ticker rafraîchi depuis la dernière exécution - Rapport ignoré (schedule.skip_unchanged)")
+            return
 
-            # Envoyer via Telegram
-            telegram_config = current_config.get('telegram', {})
-            if telegram_config.get('bot_token') and telegram_config.get('chat_id'):
-                bot = TelegramBot(
-                    telegram_config['bot_token'], telegram_config['chat_id'])
-                if bot.send_message(portfolio_data):
-                    logging.info("Message Telegram envoyé avec succès")
-                else:
-                    logging.error("Échec de l'envoi du message Telegram")
-            else:
-                logging.error("Configuration Telegram manquante")
+        # Compter les succès
+        logging.info(
+            f"Données récupérées avec succès pour {int(portfolio_data['success'].sum())}/{len(portfolio_data)} tickers")
 
-            logging.info("=== FIN ANALYSE PORTFOLIO (ARRIÈRE-PLAN) ===")
+        # Envoyer via Telegram
+        telegram_config = current_config.telegram
+        if not telegram_config.is_configured:
+            logging.error("Configuration Telegram manquante")
+            return
+
+        bot = TelegramBot(
+            telegram_config.bot_token, telegram_config.chat_id)
+        if bot.send_message(portfolio_data, telegram_config.report_formats):
+            logging.info("Message Telegram envoyé avec succès")
+        else:
+            logging.error("Échec de l'envoi du message Telegram")
 
+        # Scénarios de stress sur les résultats de l'exécution
+        if current_config.scenarios.send_telegram:
+            summary = self.scenario_engine.run(portfolio_data, current_config.scenarios)
+            if not summary.empty and not bot.send_scenario_report(summary):
+                logging.error("Échec de l'envoi du rapport de scénarios")
+
+    def _run_screener_slice(self):
+        """Traite une tranche de l'univers du screener"""
+        try:
+            with run_context(new_run_id()):
+                self.screener.run_slice()
+        except CancelledError:
+            logging.warning("Tranche du screener annulée (arrêt du planificateur)")
         except Exception as e:
-            logging.error(
-                f"Erreur lors de l'analyse du portfolio (arrière-plan): {e}", exc_info=True)
+            logging.error(f"Erreur lors du traitement du screener: {e}", exc_info=True)
+
+    def _send_screener_report(self, bot, settings: ScreenerSettings) -> bool:
+        """Envoie le classement du screener à partir des résultats stockés"""
+        try:
+            results = self.screener.top_results(settings)
+        except Exception as e:
+            logging.error(f"Erreur lors de la requête du screener: {e}")
+            return False
+
+        if bot.send_screener_report(results, settings):
+            logging.info(f"Rapport screener envoyé ({len(results)} actions)")
+            return True
+        logging.error("Échec de l'envoi du rapport screener")
+        return False
+
+    def _collect_portfolio_data(self, portfolio: list, force: bool = False):
+        """Récupère les données du portfolio en ne sollicitant l'API que pour les marchés ayant coté"""
+        tickers = [entry.ticker for entry in portfolio]
+        metadata = self.guru_api.symbol_metadata.resolve_many(tickers)
+        snapshots, fetched_at = self.snapshot_store.get_many(tickers)
+
+        # Tickers dont le marché a coté depuis le dernier instantané (tous si rafraîchissement forcé)
+        stale_tickers = []
+        for ticker in tickers:
+            last_fetch = fetched_at.get(ticker)
+            if not force and last_fetch and not self.market_calendar.needs_refresh(metadata[ticker], last_fetch):
+                logging.info(
+                    f"Pas de nouvelle séance pour {ticker} - Instantané du {last_fetch:%d/%m/%Y %H:%M} réutilisé",
+                    extra={'ticker': ticker, 'sample': True})
+            else:
+                stale_tickers.append(ticker)
+
+        # Récupération parallèle, limitée en débit par le client asynchrone
+        logging.info(f"Récupération des données pour {len(stale_tickers)} tickers")
+        fetched_data = self.guru_api.get_many_stock_data(stale_tickers)
+
+        # Un échec de récupération retombe sur l'instantané existant lorsqu'il y en a un
+        failed = ~fetched_data['success'] & np.isin(fetched_data['ticker'], snapshots['ticker'])
+        for ticker in fetched_data['ticker'][failed]:
+            logging.warning(f"Échec de la récupération de {ticker} - Instantané du {fetched_at[ticker]:%d/%m/%Y %H:%M} utilisé",
+                            extra={'ticker': ticker})
+
+        # Assemblage par colonnes: résultats récupérés puis instantanés, dans l'ordre du portfolio
+        served_fresh = fetched_data['ticker'][~failed]
+        reused = snapshots.select(~np.isin(snapshots['ticker'], served_fresh))
+        reused['from_snapshot'][:] = True
+        combined = ResultBatch.concat([fetched_data.select(~failed), reused])
+        position = {ticker: i for i, ticker in enumerate(combined['ticker'])}
+        portfolio_data = combined.select([position[ticker] for ticker in tickers])
+        portfolio_data.columns['in_portfolio'] = np.array([entry.in_portfolio for entry in portfolio], dtype=bool)
+        portfolio_data.columns['quantity'] = np.array([entry.quantity for entry in portfolio], dtype=np.float64)
+
+        # Rafraîchir les taux de change (sans effet si le tableau est récent)
+        self.fx_service.refresh()
+
+        # Persister les instantanés et les métadonnées de symboles observées
+        refreshed = self.snapshot_store.save_many(fetched_data)
+        self.guru_api.symbol_metadata.save()
 
-    def _execute_portfolio_analysis(self):
+        logging.info(
+            f"{refreshed}/{len(portfolio)} tickers rafraîchis, {int(portfolio_data['from_snapshot'].sum())} servis depuis les instantanés")
+        return portfolio_data, refreshed
+
+    def _execute_portfolio_analysis(self, force_refresh: bool = False):
         """Exécute l'analyse du portfolio pour l'interface utilisateur"""
+        enabled = st.session_state.get('profile_enabled', self.profile)
+        with run_context(new_run_id()) as run_id, self.profiler.profile(run_id, enabled) as profile_path:
+            self._analyze_portfolio(force_refresh)
+        if profile_path:
+            st.session_state.last_profile = str(profile_path)
+
+    def _analyze_portfolio(self, force_refresh: bool):
+        """Récupère les données du portfolio pour l'interface et envoie le rapport"""
         try:
             logging.info("Début de l'analyse du portfolio (interface)")
 
-            portfolio = self.config.get('portfolio', [])
+            portfolio = self.config.portfolio
             if not portfolio:
                 st.warning("Aucun ticker dans le portfolio")
                 return
 
             # Récupérer les données
-            portfolio_data = []
-            for stock in portfolio:
-                ticker = stock['ticker']
-                data = self.guru_api.get_stock_data(ticker)
-                data['in_portfolio'] = stock.get('in_portfolio', False)
-                portfolio_data.append(data)
-                time.sleep(1)  # Pause entre les requêtes
+            portfolio_data, _ = self._collect_portfolio_data(
+                portfolio, force=force_refresh)
 
             # Sauvegarder les données pour l'interface
             st.session_state.portfolio_data = portfolio_data
             st.session_state.last_execution = datetime.now()
 
             # Envoyer via Telegram
-            telegram_config = self.config.get('telegram', {})
-            if telegram_config.get('bot_token') and telegram_config.get('chat_id'):
+            telegram_config = self.config.telegram
+            if telegram_config.is_configured:
                 bot = TelegramBot(
-                    telegram_config['bot_token'], telegram_config['chat_id'])
-                bot.send_message(portfolio_data)
+                    telegram_config.bot_token, telegram_config.chat_id)
+                bot.send_message(portfolio_data, telegram_config.report_formats)
 
             logging.info(
                 "Analyse du portfolio terminée avec succès (interface)")
@@ -940,9 +3062,92 @@ class GuruFocusApp:
             st.error(f"Erreur lors de l'analyse: {e}")
 
 
+def parse_args(argv=None):
+    """Analyse les arguments de la ligne de commande"""
+    parser = argparse.ArgumentParser(description="GuruFocus Portfolio Bot")
+    parser.add_argument(
+        '--profile', action='store_true', help="Profile chaque analyse (résultats dans profiles/)")
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser(
+        'run', help="Exécute une analyse du portfolio sans interface puis quitte")
+
+    backfill_parser = subparsers.add_parser(
+        'backfill', help="Importe l'historique de valorisation de tickers")
+    backfill_parser.add_argument(
+        '--tickers', help="Liste de tickers séparés par des virgules (par défaut: portfolio configuré)")
+    backfill_parser.add_argument(
+        '--file', help="Fichier CSV de tickers (colonne ticker/symbol, sinon première colonne)")
+    backfill_parser.add_argument(
+        '--restart', action='store_true', help="Réimporte aussi les tickers déjà terminés")
+
+    rederive_parser = subparsers.add_parser(
+        'rederive', help="Reconstruit les instantanés depuis l'archive des réponses, sans appel réseau")
+    rederive_parser.add_argument(
+        '--tickers', help="Liste de tickers séparés par des virgules (par défaut: tous les tickers archivés)")
+    rederive_parser.add_argument(
+        '--history', action='store_true', help="Reconstruit aussi l'historique de valorisation")
+
+    return parser.parse_args(argv)
+
+
+def run_backfill(args):
+    """Commande d'import de l'historique de valorisation"""
+    if args.tickers:
+        tickers = [t.strip().upper() for t in args.tickers.split(',') if t.strip()]
+    elif args.file:
+        tickers = load_ticker_file(args.file)
+    else:
+        tickers = ConfigManager().get_app_config().tickers
+
+    if not tickers:
+        logging.error("Aucun ticker à importer")
+        return 1
+
+    backfill = ValuationBackfill(GuruFocusAPI(), ValuationHistoryStore())
+    summary = backfill.run(tickers, restart=args.restart)
+    return 0 if summary['failed'] == 0 else 1
+
+
+def run_rederive(args):
+    """Commande de reconstruction des instantanés depuis l'archive locale"""
+    tickers = [t.strip().upper() for t in args.tickers.split(',') if t.strip()] if args.tickers else None
+    archive = ResponseArchive()
+    # Lecture seule: une reconstruction hors ligne ne doit pas marquer les symboles comme vus
+    symbol_metadata = SymbolMetadataCache()
+    snapshot_store = SnapshotStore()
+    history_store = ValuationHistoryStore() if args.history else None
+
+    records, fetched_at = [], []
+    for ticker, archived_at, payload in archive.iter_entries('valuation', tickers, latest_only=not args.history):
+        # En mode historique, chaque réponse alimente l'historique; la plus récente devient l'instantané
+        if history_store is not None:
+            history_store.write_ticker(ticker, history_store.extract_rows(ticker, payload))
+        if records and records[-1].ticker == ticker:
+            records.pop()
+            fetched_at.pop()
+        records.append(GuruFocusAPI.extract_valuation(ticker, payload, symbol_metadata.get(ticker)))
+        fetched_at.append(archived_at)
+
+    written = snapshot_store.save_many(ResultBatch.from_records(records), fetched_at)
+    logging.info(f"Reconstruction terminée: {written} instantanés depuis l'archive")
+    return 0
+
+
 def main():
     """Fonction principale"""
-    app = GuruFocusApp()
+    args = parse_args()
+    logging_settings = ConfigManager().get_app_config().logging
+    setup_logging(logging_settings.level, logging_settings.sample_rate)
+    if args.command == 'backfill':
+        sys.exit(run_backfill(args))
+    if args.command == 'rederive':
+        sys.exit(run_rederive(args))
+
+    app = GuruFocusApp(profile=args.profile)
+    if args.command == 'run':
+        app._execute_portfolio_analysis_background()
+        return
     app.run()
 
 